@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import asyncio, contextlib, json, os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from tqdm import tqdm
+
+from ImageScraper import ImageScraper
+from HostScheduler import HostScheduler
+from ByteScheduler import ByteScheduler
+from FileNumbering import FileNumbering
+from ScrapeJournal import ScrapeJournal
+from QueryPlanner import QueryPlanner
+from SearchCache import SearchCache
+from ImageIndex import ImageIndex
+from PostProcessor import PostProcessor
+from Metrics import Metrics
+
+# Just for typing
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+from os import PathLike
+
+if TYPE_CHECKING:
+    import aiohttp
+    from ImageDownloader import ImageDownloader
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+
+class BatchScraper:
+    # Runs many categories, each with its own terms, directory and date plan, through one set of
+    # search and download workers so nothing sits idle between categories
+
+    class Category:
+        name: str
+        scraper: ImageScraper
+
+        journal: ScrapeJournal | None
+        index: ImageIndex | None
+        numbering: FileNumbering | None
+        planner: QueryPlanner | None
+        search_cache: SearchCache | None
+        postprocessor: PostProcessor | None
+        downloader: ImageDownloader | None
+
+        search_progress: tqdm | None
+        download_progress: tqdm | None
+
+        num_links: int
+        num_saved: int
+
+        def __init__(self, name: str, scraper: ImageScraper) -> None:
+            self.name = name
+            self.scraper = scraper
+
+            self.journal = None
+            self.index = None
+            self.numbering = None
+            self.planner = None
+            self.search_cache = None
+            self.postprocessor = None
+            self.downloader = None
+
+            self.search_progress = None
+            self.download_progress = None
+
+            self.num_links = 0
+            self.num_saved = 0
+
+    # Top level manifest keys passed to the batch, everything in a category is passed to its scraper
+    batch_kwargs = ("threads_search_num", "threads_download_num", "threads_download_host_num", "download_host_rate", "metrics_path", "metrics_port",
+                    "download_byte_rate", "download_byte_budget", "min_free_bytes")
+
+    # Top level manifest keys that are also the categories' own settings, unless a category sets them itself
+    category_kwargs = ("threads_search_num", "threads_download_num", "threads_download_host_num", "download_host_rate")
+
+    categories: List[Category]
+
+    # Caps over all categories, each category stays within its own settings as well
+    threads_search_num: int
+    threads_download_num: int
+    # Shared by the categories with the same host settings
+    threads_download_host_num: int
+    download_host_rate: float | None
+
+    # Shared by every category, on top of any limits a category sets for itself
+    download_byte_rate: float | None
+    download_byte_budget: int | None
+    min_free_bytes: int | None
+
+    metrics_path: str | PathLike | None
+    metrics_port: int | None
+
+    def __init__(self, categories: List[Tuple[str, ImageScraper]], threads_search_num: int = 4, threads_download_num: int = 8,
+                        threads_download_host_num: int = 4, download_host_rate: float | None = 8,
+                        metrics_path: str | PathLike | None = None, metrics_port: int | None = None, download_byte_rate: float | None = None,
+                        download_byte_budget: int | None = None, min_free_bytes: int | None = None) -> None:
+
+        if not isinstance(categories, list) or not all([isinstance(category, tuple) and len(category) == 2 and isinstance(category[1], ImageScraper) for category in categories]):
+            ImageScraper._raise_type_error(categories, ["List[Tuple[str, ImageScraper]]"])
+
+        if len(set([name for (name, _) in categories])) != len(categories):
+            raise ValueError("category names must be unique")
+
+        if len(set([os.path.abspath(scraper.save_location) for (_, scraper) in categories])) != len(categories):
+            raise ValueError("categories must not share a save_location")
+
+        if threads_search_num < 1 or threads_download_num < 1:
+            raise ValueError("threads_search_num and threads_download_num must be >= 1")
+
+        if (download_byte_rate is not None and download_byte_rate <= 0) or (download_byte_budget is not None and download_byte_budget < 0) or (min_free_bytes is not None and min_free_bytes < 0):
+            raise ValueError("download_byte_rate must be > 0, download_byte_budget and min_free_bytes >= 0")
+
+        self.threads_search_num = threads_search_num
+        self.threads_download_num = threads_download_num
+        self.threads_download_host_num = threads_download_host_num
+        self.download_host_rate = download_host_rate
+
+        self.download_byte_rate = download_byte_rate
+        self.download_byte_budget = download_byte_budget
+        self.min_free_bytes = min_free_bytes
+
+        self.metrics_path = metrics_path
+        self.metrics_port = metrics_port
+
+        self.categories = [BatchScraper.Category(name, scraper) for (name, scraper) in categories]
+
+    @staticmethod
+    def load_manifest(path: str | PathLike) -> Dict[str, Any]:
+        with open(path, 'r') as file:
+            if str(path).endswith((".yaml", ".yml")):
+                # Only needed for YAML manifests
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("YAML manifests need PyYAML, pip install pyyaml or use a JSON manifest")
+
+                return yaml.safe_load(file)
+
+            return json.load(file)
+
+    @staticmethod
+    def _scraper_kwargs(config: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs = dict(config)
+
+        # YAML and JSON have no tuples or enums
+        for key in ["min_resolution", "max_resolution", "resize_to"]:
+            if isinstance(kwargs.get(key), list):
+                kwargs[key] = tuple(kwargs[key])
+
+        if isinstance(kwargs.get("resize_sizes"), list):
+            kwargs["resize_sizes"] = [tuple(resize_size) for resize_size in kwargs["resize_sizes"]]
+
+        if isinstance(kwargs.get("driver_type"), str):
+            kwargs["driver_type"] = ImageScraper.DriverType[kwargs["driver_type"]]
+
+        if isinstance(kwargs.get("search_backend"), str):
+            kwargs["search_backend"] = ImageScraper.SearchBackend[kwargs["search_backend"]]
+
+        return kwargs
+
+    @staticmethod
+    def from_manifest(manifest: Dict[str, Any] | str | PathLike) -> "BatchScraper":
+        if not isinstance(manifest, dict):
+            manifest = BatchScraper.load_manifest(manifest)
+
+        # A category may use all of the workers when the others have nothing to do, unless it sets its own limits
+        inherited = {key: manifest[key] for key in BatchScraper.category_kwargs if key in manifest}
+        defaults = manifest.get("defaults", {})
+
+        categories = []
+
+        for config in manifest["categories"]:
+            config = {**inherited, **defaults, **config}
+
+            name = config.pop("name", None)
+            engine = ImageScraper.get_engine(config.pop("engine", manifest.get("engine", "google")))
+
+            if name is None:
+                raise ValueError("every category needs a name")
+
+            categories.append((name, engine(**BatchScraper._scraper_kwargs(config))))
+
+        return BatchScraper(categories, **{key: manifest[key] for key in BatchScraper.batch_kwargs if key in manifest})
+
+    def _open_metrics(self) -> Metrics:
+        metrics = Metrics(self.metrics_path)
+
+        if self.metrics_port is not None:
+            metrics.serve(self.metrics_port)
+
+        return metrics
+
+    async def _run_category(self, category: Category, session: aiohttp.ClientSession, metrics: Metrics, search_pool: ImageScraper.SearchPool | None,
+                            search_slots: asyncio.Semaphore) -> None:
+
+        queue = category.downloader.create_queue()
+        workers = category.downloader.start_workers(session, queue, on_result=lambda url, result: category.download_progress.update(1))
+
+        async def enqueue(img_links_elm: List[str]) -> None:
+            category.num_links += len(img_links_elm)
+
+            category.download_progress.total += len(img_links_elm)
+            category.download_progress.refresh()
+
+            for img_link in img_links_elm:
+                await queue.put(img_link)
+
+        async def enqueue_pending() -> None:
+            for pending_links in pending_link_batches:
+                await enqueue(pending_links)
+
+        # Links left over from an interrupted run are downloaded while the search starts, read before it adds any
+        pending_link_batches = category.journal.pending_link_batches()
+
+        try:
+            await asyncio.gather(enqueue_pending(),
+                                 category.scraper._search(category.journal, category.planner, enqueue, metrics=metrics, search_pool=search_pool,
+                                                          search_slots=search_slots, search_progress=category.search_progress,
+                                                          search_cache=category.search_cache))
+
+            category.num_saved = await category.downloader.stop_workers(queue, workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def _run(self, metrics: Metrics, driver: RemoteWebDriver | None = None) -> None:
+        num_search_workers = min(self.threads_search_num, sum([category.planner.max_tasks for category in self.categories]))
+
+        search_pool = None
+
+        if num_search_workers > 0:
+            # Any scraper will do for the workers' drivers, pick one that needs them
+            template = next((category.scraper for category in self.categories if category.scraper._needs_driver), self.categories[0].scraper)
+            search_pool = template._open_search_pool(num_search_workers, driver, metrics)
+
+        search_slots = asyncio.Semaphore(max(num_search_workers, 1))
+
+        # Per host limits have to hold across categories, they often find images on the same hosts.
+        # Categories with a download_host_rate of their own share a scheduler with the others that set the same
+        schedulers: Dict[float | None, HostScheduler] = {}
+
+        byte_scheduler = None
+
+        if self.download_byte_rate is not None or self.download_byte_budget is not None or self.min_free_bytes is not None:
+            byte_scheduler = ByteScheduler(self.download_byte_rate, self.download_byte_budget, self.min_free_bytes)
+
+        # Every category has its own workers, all of them together run at most threads_download_num downloads
+        download_slots = asyncio.Semaphore(self.threads_download_num)
+
+        for category in self.categories:
+            download_host_rate = category.scraper.download_host_rate
+
+            if download_host_rate not in schedulers:
+                schedulers[download_host_rate] = HostScheduler(download_host_rate)
+
+            category.downloader = category.scraper._create_downloader(category.numbering, category.index, metrics, category.postprocessor, byte_scheduler,
+                                                                    category.journal)
+            category.downloader.scheduler = schedulers[download_host_rate]
+            category.downloader.slots = download_slots
+            category.downloader.clean_partial()
+
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                # A session per category, for its own connection limits
+                sessions = [await stack.enter_async_context(category.downloader.create_session()) for category in self.categories]
+
+                await asyncio.gather(*[self._run_category(category, session, metrics, search_pool, search_slots)
+                                       for (category, session) in zip(self.categories, sessions)])
+        finally:
+            if search_pool is not None:
+                search_pool.close()
+
+    def run(self, driver: RemoteWebDriver | None = None) -> None:
+        metrics = self._open_metrics()
+
+        # One pool for every category's decoding, sized for the one that asks for the most
+        postprocessing = [category.scraper for category in self.categories if category.scraper._postprocessing]
+        executor = None
+
+        if len(postprocessing) > 0:
+            workers = [scraper.postprocess_workers for scraper in postprocessing if scraper.postprocess_workers is not None]
+            executor = ProcessPoolExecutor(max_workers=max(workers) if len(workers) > 0 else None)
+
+        try:
+            for (num, category) in enumerate(self.categories):
+                (category.journal, category.index, category.numbering, category.search_cache, category.postprocessor) = category.scraper._open_resources(executor)
+
+                # An interrupted run is resumed with its original dates
+                category.planner = category.scraper._create_planner(category.journal.start_run())
+
+                category.search_progress = tqdm(total=0, desc=f"{category.name} search", position=2*num)
+                category.download_progress = tqdm(total=0, desc=f"{category.name} download", position=2*num + 1)
+
+            metrics.event("batch_start", categories=[category.name for category in self.categories])
+
+            with metrics.timer("run_seconds"):
+                asyncio.run(self._run(metrics, driver))
+
+            for category in self.categories:
+                category.journal.finish_run()
+        finally:
+            for category in self.categories:
+                for progress in [category.search_progress, category.download_progress]:
+                    if progress is not None:
+                        progress.close()
+
+                ImageScraper._close_resources(category.journal, category.index, category.numbering, category.search_cache, category.postprocessor)
+
+            if executor is not None:
+                executor.shutdown()
+
+            metrics.close()
+
+        print()
+
+        for category in self.categories:
+            print(f"{category.name}: found {category.num_links} links in {len(category.scraper.search_terms)} search terms, saved {category.num_saved} out of {category.num_links}")
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from urllib.parse import quote_plus
+
+import datetime, html, json, re
+
+# Just for typing
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+from ImageScraper import ImageScraper
+from ScrollPaginator import ScrollPaginator
+from Metrics import Metrics
+
+class BingImageScraper(ImageScraper):
+    engine_name = "bing"
+
+    # Bing only filters by age relative to today, every date range would return the same results
+    supports_date_ranges = False
+
+    # Pointed at a local stand-in by the benchmarks
+    search_base_url = "https://www.bing.com/images/search"
+
+    # The endpoint the result page loads more results from answers plain requests with the same anchors
+    supports_http = True
+    # Upper bound for pages_num = -1
+    max_http_pages = 10
+
+    # Every result anchor carries its metadata as JSON in the m attribute, murl is the original image
+    _murl_pattern = re.compile(r'murl&quot;:\s*&quot;(.*?)&quot;')
+
+    result_selector = "a.iusc"
+    button_xpath = "//a[contains(@class, 'btn_seemore')]"
+    # Bing loads more on scroll, roughly this many results at a time
+    results_per_page = 35
+
+    @staticmethod
+    def create_paginator() -> ScrollPaginator:
+        # No end of results marker, the paginator stops once scrolling loads nothing new
+        return ScrollPaginator(BingImageScraper.result_selector, None, "", BingImageScraper.button_xpath, idle_timeout_s=3,
+                               results_per_page=BingImageScraper.results_per_page)
+
+    @staticmethod
+    def search_url(searchterm: str) -> str:
+        return f"{BingImageScraper.search_base_url}?q={quote_plus(searchterm)}&form=HDRSC2&first=1"
+
+    @staticmethod
+    def async_url(searchterm: str, page: int) -> str:
+        base_url = BingImageScraper.search_base_url.rsplit("/", 1)[0]
+
+        return f"{base_url}/async?q={quote_plus(searchterm)}&first={1 + page*BingImageScraper.results_per_page}&count={BingImageScraper.results_per_page}"
+
+    @staticmethod
+    def parse_image_links(page_source: str) -> List[str]:
+        img_links = []
+
+        for match in BingImageScraper._murl_pattern.finditer(page_source):
+            try:
+                img_links.append(json.loads('"' + html.unescape(match.group(1)) + '"'))
+            except ValueError:
+                continue
+
+        return list(dict.fromkeys(img_links))
+
+    @staticmethod
+    def fetch_image_links(searchterm: str, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
+        num_pages = BingImageScraper.max_http_pages if pages_num == -1 else min(max(pages_num, 1), BingImageScraper.max_http_pages)
+
+        return ImageScraper.fetch_pages([BingImageScraper.async_url(searchterm, page) for page in range(num_pages)], BingImageScraper.parse_image_links)
+
+    @staticmethod
+    def get_image_links(searchterm: str, driver: RemoteWebDriver, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
+        with Metrics.task_timer("page_load_seconds"):
+            driver.get(BingImageScraper.search_url(searchterm))
+
+        paginator = BingImageScraper.create_paginator()
+
+        with Metrics.task_timer("pagination_seconds"):
+            num_pages = paginator.run(driver, pages_num)
+
+        Metrics.task_record("pages_total", num_pages)
+
+        for page_timing in paginator.page_timings:
+            Metrics.task_record("page_seconds", page_timing)
+
+        with Metrics.task_timer("link_extraction_seconds"):
+            return BingImageScraper.parse_image_links(driver.page_source)
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio, shutil, time
+
+# Just for typing
+from typing import Dict, List, Set, Tuple
+from os import PathLike
+
+
+class ByteScheduler:
+    # Holds downloads to a total bandwidth and a byte budget, and pauses them while the disk they are written to
+    # is low on space. A category's scheduler can have the batch's as its parent, every limit up the chain applies
+
+    max_bytes_per_s: float | None
+    max_bytes: int | None
+    min_free_bytes: int | None
+
+    # Bursts above the rate are let through, up to this many seconds worth of bytes
+    burst_s: float
+    # How often paused downloads look at the disk again
+    free_space_poll_s: float
+
+    # Free space is read at most this often per path, not on every download
+    free_space_cache_s: float = 1
+
+    parent: ByteScheduler | None
+
+    # Counted against max_bytes, as they arrive
+    num_bytes: int
+    # Held for downloads in flight, so they can't all start on the same remaining bytes
+    reserved_bytes: int
+
+    def __init__(self, max_bytes_per_s: float | None = None, max_bytes: int | None = None, min_free_bytes: int | None = None,
+                        burst_s: float = 1, free_space_poll_s: float = 5, parent: ByteScheduler | None = None) -> None:
+
+        if max_bytes_per_s is not None and max_bytes_per_s <= 0:
+            raise ValueError("max_bytes_per_s must be > 0")
+
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes must be >= 0")
+
+        if min_free_bytes is not None and min_free_bytes < 0:
+            raise ValueError("min_free_bytes must be >= 0")
+
+        self.max_bytes_per_s = max_bytes_per_s
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.burst_s = burst_s
+        self.free_space_poll_s = free_space_poll_s
+        self.parent = parent
+
+        self.num_bytes = 0
+        self.reserved_bytes = 0
+        self._over_budget = False
+
+        self._tokens = max_bytes_per_s * burst_s if max_bytes_per_s is not None else 0
+        self._updated = time.monotonic()
+
+        self._free_bytes: Dict[str, Tuple[float, int]] = {}
+        # A batch's scheduler watches every category's save location
+        self._paused_paths: Set[str] = set()
+
+    def _chain(self) -> List[ByteScheduler]:
+        schedulers = []
+        scheduler = self
+
+        while scheduler is not None:
+            schedulers.append(scheduler)
+            scheduler = scheduler.parent
+
+        return schedulers
+
+    @property
+    def remaining_bytes(self) -> int | None:
+        remaining = [scheduler.max_bytes - scheduler.num_bytes - scheduler.reserved_bytes for scheduler in self._chain() if scheduler.max_bytes is not None]
+
+        return max(min(remaining), 0) if len(remaining) > 0 else None
+
+    def fits(self, num_bytes: int | None = None) -> bool:
+        # Whether a download of num_bytes, or of unknown size, may start
+        remaining_bytes = self.remaining_bytes
+
+        if remaining_bytes is None or (remaining_bytes > 0 and (num_bytes is None or num_bytes <= remaining_bytes)):
+            return True
+
+        if not self._over_budget:
+            self._over_budget = True
+            print(f"byte budget down to {remaining_bytes / 1e6:.1f} MB, the remaining links are left for the next run")
+
+        return False
+
+    def reserve(self, num_bytes: int) -> bool:
+        if not self.fits(num_bytes):
+            return False
+
+        for scheduler in self._chain():
+            scheduler.reserved_bytes += num_bytes
+
+        return True
+
+    def release(self, num_bytes: int) -> None:
+        for scheduler in self._chain():
+            scheduler.reserved_bytes -= num_bytes
+
+    def free_bytes(self, path: str | PathLike) -> int:
+        path = str(path)
+        now = time.monotonic()
+
+        if path not in self._free_bytes or now - self._free_bytes[path][0] > self.free_space_cache_s:
+            self._free_bytes[path] = (now, shutil.disk_usage(path).free)
+
+        return self._free_bytes[path][1]
+
+    def has_space(self, path: str | PathLike) -> bool:
+        low = any([scheduler.min_free_bytes is not None and scheduler.free_bytes(path) < scheduler.min_free_bytes for scheduler in self._chain()])
+
+        if low != (str(path) in self._paused_paths):
+            if low:
+                self._paused_paths.add(str(path))
+            else:
+                self._paused_paths.discard(str(path))
+
+            print(f"{'pausing' if low else 'resuming'} downloads, {path} has {self.free_bytes(path) / 1e6:.0f} MB free")
+
+        return not low
+
+    async def wait_for_space(self, path: str | PathLike) -> float:
+        # Other jobs may free space, or someone may move the images off, so this waits rather than giving up
+        start = time.monotonic()
+
+        while not self.has_space(path):
+            await asyncio.sleep(self.free_space_poll_s)
+
+        return time.monotonic() - start
+
+    def count(self, num_bytes: int) -> float:
+        # The bytes have to have been reserved, they move from the reservation to the count.
+        # Returns how long the rate limits want the caller to wait
+        delay = 0
+
+        for scheduler in self._chain():
+            scheduler.reserved_bytes -= num_bytes
+            scheduler.num_bytes += num_bytes
+
+            if scheduler.max_bytes_per_s is None:
+                continue
+
+            # The bucket goes into debt, so concurrent downloads queue up behind each other's bytes
+            now = time.monotonic()
+
+            scheduler._tokens = min(scheduler.max_bytes_per_s * scheduler.burst_s, scheduler._tokens + (now - scheduler._updated) * scheduler.max_bytes_per_s)
+            scheduler._updated = now
+            scheduler._tokens -= num_bytes
+
+            if scheduler._tokens < 0:
+                delay = max(delay, -scheduler._tokens / scheduler.max_bytes_per_s)
+
+        return delay
+
+    async def consume(self, num_bytes: int) -> None:
+        delay = self.count(num_bytes)
+
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,314 @@
+import hashlib, html, io, json, random, threading, time
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote
+
+from PIL import Image
+
+# Just for typing
+from typing import Dict, List, Tuple
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients hang up on kept alive connections all the time
+        pass
+
+
+class FakeImageServer:
+    # Local stand-in for Google Images and the hosts its results point at, for benchmarks.
+    # Result pages have the DOM shape GoogleImageScraper's XPaths expect, images are generated
+    # deterministically from their id so repeated runs see the same bytes.
+
+    results_per_page: int
+    pages_per_query: int
+    page_latency_s: float
+    url_overlap: float
+
+    image_latency_s: float
+    image_size_range: Tuple[int, int]
+    error_rate: float
+    duplicate_rate: float
+
+    seed: int
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, results_per_page: int = 100, pages_per_query: int = 3,
+                        page_latency_s: float = 0.1, url_overlap: float = 0.1, image_latency_s: float = 0.02,
+                        image_size_range: Tuple[int, int] = (200, 1200), error_rate: float = 0.05, duplicate_rate: float = 0.05,
+                        seed: int = 0) -> None:
+
+        self.results_per_page = results_per_page
+        self.pages_per_query = pages_per_query
+        self.page_latency_s = page_latency_s
+        self.url_overlap = url_overlap
+
+        self.image_latency_s = image_latency_s
+        self.image_size_range = image_size_range
+        self.error_rate = error_rate
+        self.duplicate_rate = duplicate_rate
+
+        self.seed = seed
+
+        self._image_cache: Dict[int, bytes] = {}
+        self._image_cache_lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so connection pooling in the downloader shows up in the numbers
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                server._handle(self)
+
+            def do_HEAD(self) -> None:
+                server._handle(self)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.httpd = _QuietHTTPServer((host, port), Handler)
+
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        (host, port) = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def search_url(self) -> str:
+        return self.base_url + "/search"
+
+    @property
+    def bing_search_url(self) -> str:
+        return self.base_url + "/bing/images/search"
+
+    @property
+    def api_url(self) -> str:
+        return self.base_url + "/api/images"
+
+    def start(self) -> "FakeImageServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeImageServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _rng(self, *key) -> random.Random:
+        return random.Random(hashlib.sha256(repr((self.seed,) + key).encode()).digest())
+
+    def _send(self, request: BaseHTTPRequestHandler, status: int, content_type: str, body: bytes) -> None:
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+
+        # HEAD gets the same headers, Content-Length included
+        if request.command != "HEAD":
+            request.wfile.write(body)
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        url = urlparse(request.path)
+        query = parse_qs(url.query)
+
+        try:
+            if url.path == "/search" and "ijn" in query:
+                # Later pages for clients without a browser
+                self._send(request, 200, "text/html; charset=utf-8", self.result_page(query.get("q", [""])[0], int(query["ijn"][0])).encode())
+            elif url.path == "/search":
+                self._send(request, 200, "text/html; charset=utf-8", self.search_page(query.get("q", [""])[0]).encode())
+            elif url.path == "/search_page":
+                self._send(request, 200, "text/html; charset=utf-8", self.result_page(query.get("q", [""])[0], int(query.get("page", ["0"])[0])).encode())
+            elif url.path == "/bing/images/search":
+                self._send(request, 200, "text/html; charset=utf-8", self.bing_search_page(query.get("q", [""])[0]).encode())
+            elif url.path == "/bing/images/async" and "first" in query:
+                # Bing's own paging, first is the 1-based offset of the first result
+                page = (int(query["first"][0]) - 1) // int(query.get("count", [str(self.results_per_page)])[0])
+                self._send(request, 200, "text/html; charset=utf-8", self.bing_result_page(query.get("q", [""])[0], page).encode())
+            elif url.path == "/bing/images/async":
+                self._send(request, 200, "text/html; charset=utf-8", self.bing_result_page(query.get("q", [""])[0], int(query.get("page", ["0"])[0])).encode())
+            elif url.path == "/api/images":
+                self._send(request, 200, "application/json", json.dumps(self.api_results(query.get("q", [""])[0], int(query.get("page", ["1"])[0]))).encode())
+            elif url.path.startswith("/images/"):
+                self._handle_image(request, url.path[len("/images/"):])
+            else:
+                self._send(request, 404, "text/plain", b"not found")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _handle_image(self, request: BaseHTTPRequestHandler, name: str) -> None:
+        time.sleep(self.image_latency_s)
+
+        try:
+            image_id = int(name.split(".")[0])
+        except ValueError:
+            self._send(request, 404, "text/plain", b"not found")
+            return
+
+        rng = self._rng("image", image_id)
+        roll = rng.random()
+
+        if roll < self.error_rate:
+            # Half the failures look like the HTML error pages real hosts send
+            if rng.random() < 0.5:
+                self._send(request, 503, "text/plain", b"unavailable")
+            else:
+                self._send(request, 200, "text/html", b"<html><body>Access denied</body></html>")
+            return
+
+        if roll < self.error_rate + self.duplicate_rate and image_id > 0:
+            # Same bytes as an earlier image, served from a different URL
+            image_id = rng.randrange(0, image_id)
+
+        self._send(request, 200, "image/jpeg", self.image(image_id))
+
+    def image(self, image_id: int) -> bytes:
+        with self._image_cache_lock:
+            if image_id in self._image_cache:
+                return self._image_cache[image_id]
+
+        rng = self._rng("pixels", image_id)
+
+        width = rng.randint(*self.image_size_range)
+        height = rng.randint(*self.image_size_range)
+
+        # Noise compresses poorly, so byte sizes follow the dimensions
+        image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+
+        with self._image_cache_lock:
+            # Bounded, generating again is cheaper than holding every image
+            if len(self._image_cache) > 1000:
+                self._image_cache.clear()
+
+            self._image_cache[image_id] = buffer.getvalue()
+
+        return buffer.getvalue()
+
+    def result_links(self, searchterm: str, page: int, engine: str = "google") -> List[str]:
+        links = []
+
+        # Engines mostly find different images for the same term
+        if engine != "google":
+            searchterm = f"{engine}:{searchterm}"
+
+        for num in range(self.results_per_page):
+            rng = self._rng("result", searchterm, page, num)
+
+            # Some results are shared between queries, like popular images are on Google
+            if rng.random() < self.url_overlap:
+                image_id = rng.randrange(0, 1000)
+            else:
+                image_id = 1000 + (int.from_bytes(hashlib.sha256(f"{searchterm}/{page}/{num}".encode()).digest()[:6], "big"))
+
+            links.append(f"{self.base_url}/images/{image_id}.jpg")
+
+        return links
+
+    def result_page(self, searchterm: str, page: int) -> str:
+        time.sleep(self.page_latency_s)
+
+        if page >= self.pages_per_query:
+            return ""
+
+        results = []
+
+        for link in self.result_links(searchterm, page):
+            href = html.escape(f"/imgres?imgurl={quote(link, safe='')}&imgrefurl={quote(self.base_url, safe='')}")
+            results.append(f'<div class="BUooTd"><div><a href="{href}"><img src="data:,"></a></div></div>')
+
+        return "".join(results)
+
+    def search_page(self, searchterm: str) -> str:
+        first_page = self.result_page(searchterm, 0)
+
+        # Keeps the absolute paths GoogleImageScraper looks for:
+        # results  /html/body/div[2]/c-wiz/div[3]/div[1]/div/div/div/div/div[1]/div[1]/span/div[1]/div[1]/div/div/a[1]
+        # end text /html/body/div[2]/c-wiz/div[3]/div[1]/div/div/div/div/div[1]/div[2]/div[1]/div[2]/div[1]/div
+        # button   /html/body/div[2]/c-wiz/div[3]/div[1]/div/div/div/div/div[1]/div[2]/div[2]/input
+        return f"""<!DOCTYPE html>
+<html><head><title>{html.escape(searchterm)} - Google Search</title></head>
+<body><div></div><div><c-wiz><div></div><div></div><div><div><div><div><div><div><div>
+<div><span><div><div id="results">{first_page}</div></div></span></div>
+<div><div><div></div><div><div><div id="end"></div></div></div></div><div><input id="more" type="button" value="Show more results"></div></div>
+</div></div></div></div></div></div></div></c-wiz></div>
+<script>
+let page = 1;
+const more = document.getElementById("more");
+more.onclick = () => {{
+    more.style.display = "none";
+    fetch("/search_page?q={quote(searchterm, safe='')}&page=" + page).then((response) => response.text()).then((text) => {{
+        page += 1;
+        document.getElementById("results").insertAdjacentHTML("beforeend", text);
+        if (text.length === 0 || page >= {self.pages_per_query}) {{
+            document.getElementById("end").innerText = "Looks like you've reached the end";
+        }} else {{
+            more.style.display = "";
+        }}
+    }});
+}};
+</script>
+<script>AF_initDataCallback({{key: 'ds:1', data: {json.dumps([[link, 600, 800] for link in self.result_links(searchterm, 0)])}}});</script>
+</body></html>"""
+
+    def bing_result_page(self, searchterm: str, page: int) -> str:
+        time.sleep(self.page_latency_s)
+
+        if page >= self.pages_per_query:
+            return ""
+
+        results = []
+
+        for link in self.result_links(searchterm, page, "bing"):
+            metadata = html.escape(json.dumps({"murl": link, "purl": self.base_url}, separators=(",", ":")))
+            results.append(f'<li><div class="imgpt"><a class="iusc" m="{metadata}" href="#"><img src="data:,"></a></div></li>')
+
+        return "".join(results)
+
+    def bing_search_page(self, searchterm: str) -> str:
+        first_page = self.bing_result_page(searchterm, 0)
+
+        return f"""<!DOCTYPE html>
+<html><head><title>{html.escape(searchterm)} - Bing images</title></head>
+<body><div id="mmComponent_images_1"><ul id="results">{first_page}</ul></div>
+<a class="btn_seemore cbtn mBtn" id="more" href="#">See more images</a>
+<script>
+let page = 1;
+const more = document.getElementById("more");
+more.onclick = (event) => {{
+    event.preventDefault();
+    more.style.display = "none";
+    fetch("/bing/images/async?q={quote(searchterm, safe='')}&page=" + page).then((response) => response.text()).then((text) => {{
+        page += 1;
+        document.getElementById("results").insertAdjacentHTML("beforeend", text);
+        if (text.length !== 0 && page < {self.pages_per_query}) {{
+            more.style.display = "";
+        }}
+    }});
+}};
+</script>
+</body></html>"""
+
+    def api_results(self, searchterm: str, page: int) -> dict:
+        time.sleep(self.page_latency_s)
+
+        # Pages start at 1 like most search APIs
+        if page < 1 or page > self.pages_per_query:
+            return {"result_count": 0, "page_count": self.pages_per_query, "results": []}
+
+        results = [{"url": link, "foreign_landing_url": self.base_url} for link in self.result_links(searchterm, page - 1, "json")]
+
+        return {"result_count": self.results_per_page * self.pages_per_query, "page_count": self.pages_per_query, "results": results}
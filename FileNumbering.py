@@ -0,0 +1,95 @@
+import json, os, pathlib
+
+# Just for typing
+from os import PathLike
+
+
+class FileNumbering:
+    file_name = ".numbering.json"
+
+    # Numbers are reserved in blocks so the state file is rewritten rarely,
+    # a crash only leaves a gap of at most one block
+    block_size: int = 1000
+
+    # Wide enough that new directories never need renaming
+    default_padding: int = 8
+
+    holding_dir: str | PathLike
+    padding: int
+
+    def __init__(self, holding_dir: str | PathLike = "./", padding: int | None = None) -> None:
+        if padding is not None and padding < 1:
+            raise ValueError("padding must be >= 1")
+
+        self.holding_dir = holding_dir
+
+        os.makedirs(holding_dir, exist_ok=True)
+
+        state = self._read_state()
+
+        if state is None:
+            # Directories from before the state file existed are scanned once
+            state = FileNumbering.scan(holding_dir)
+
+            if state["padding"] == 0:
+                state["padding"] = padding if padding is not None else FileNumbering.default_padding
+
+        self.padding = state["padding"]
+
+        self._next_num = state["next_num"]
+        self._reserved = self._next_num
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.holding_dir, FileNumbering.file_name)
+
+    @property
+    def next_num(self) -> int:
+        return self._next_num
+
+    @staticmethod
+    def scan(holding_dir: str | PathLike) -> dict:
+        filenames = [pathlib.PurePath(file).stem for file in os.listdir(holding_dir) if pathlib.PurePath(file).stem.isdigit()]
+
+        if len(filenames) == 0:
+            return {"next_num": 0, "padding": 0}
+
+        return {"next_num": max([int(file) for file in filenames]) + 1, "padding": min([len(file) for file in filenames])}
+
+    def _read_state(self) -> dict | None:
+        try:
+            with open(self.state_path, 'r') as file:
+                state = json.load(file)
+
+            return {"next_num": int(state["next_num"]), "padding": int(state["padding"])}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_state(self, next_num: int) -> None:
+        temp_path = self.state_path + ".tmp"
+
+        with open(temp_path, 'w') as file:
+            json.dump({"next_num": next_num, "padding": self.padding}, file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, self.state_path)
+
+    def next(self) -> int:
+        num = self._next_num
+
+        if num >= self._reserved:
+            self._reserved = num + self.block_size
+            self._write_state(self._reserved)
+
+        self._next_num += 1
+
+        return num
+
+    def file_name_for(self, num: int, extension: str) -> str:
+        return "{num:0{padding}d}{extension}".format(num=num, padding=self.padding, extension=extension)
+
+    def close(self) -> None:
+        # Give back the unused part of the reserved block
+        self._write_state(self._next_num)
+        self._reserved = self._next_num
@@ -1,24 +1,59 @@
-from selenium.webdriver import Keys, ActionChains
-from selenium.webdriver.common.by import By
-from urllib.parse import quote, urlparse, parse_qs
+from __future__ import annotations
 
-import time, datetime
+from urllib.parse import quote, unquote, urlparse, parse_qs
+from enum import IntEnum, auto
+
+import datetime, html, json, re
 
 # Just for typing
 from os import PathLike
-from typing import List
-from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
 
 from ImageScraper import ImageScraper
+from ScrollPaginator import ScrollPaginator
+from Metrics import Metrics
 
 class GoogleImageScraper(ImageScraper):
+    class LinkExtraction(IntEnum):
+        Bulk = auto()
+        Click = auto()
 
-    @staticmethod
-    def get_image_links(searchterm: str, driver: RemoteWebDriver, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
-        if (not before is None and not isinstance(before, datetime.date)) or (not after is None and not isinstance(after, datetime.date)):
-            raise TypeError
+    engine_name = "google"
+
+    # Pointed at a local stand-in by the benchmarks
+    search_base_url = "https://www.google.com/search"
 
+    # The result page carries its inline result data without running any scripts
+    supports_http = True
+    # Further pages of results for plain HTTP fetches, the browser gets them by scrolling
+    page_param = "ijn"
+    # Upper bound for pages_num = -1
+    max_http_pages = 10
 
+    # Bulk parses the page source in one round trip and falls back to clicking when it finds nothing
+    link_extraction: LinkExtraction = LinkExtraction.Bulk
+
+    # Links found in result hrefs once a thumbnail has been clicked or rendered server side
+    _imgurl_pattern = re.compile(r'[?&;]imgurl=([^&"\'\s]+)')
+    # Inline result data lists every original image as ["url",height,width]
+    _inline_pattern = re.compile(r'\["(https?://(?:[^"\\]|\\.)+)",\d+,\d+\]')
+    # Google's own thumbnails and assets are in the inline data as well
+    _ignored_hosts = ("gstatic.com", "google.com", "googleusercontent.com", "ggpht.com")
+
+    result_selector = "div.BUooTd"
+    end_xpath = "/html/body/div[2]/c-wiz/div[3]/div[1]/div/div/div/div/div[1]/div[2]/div[1]/div[2]/div[1]/div"
+    end_text = "Looks like you've reached the end"
+    button_xpath = "/html/body/div[2]/c-wiz/div[3]/div[1]/div/div/div/div/div[1]/div[2]/div[2]/input"
+
+    @staticmethod
+    def create_paginator() -> ScrollPaginator:
+        return ScrollPaginator(GoogleImageScraper.result_selector, GoogleImageScraper.end_xpath, GoogleImageScraper.end_text, GoogleImageScraper.button_xpath)
+
+    @staticmethod
+    def search_url(searchterm: str, before: datetime.date | None = None, after: datetime.date | None = None) -> str:
         urlsearchterm = "+".join([quote(term, safe="") for term in searchterm.split(" ")])
         
         if not before is None:
@@ -28,40 +63,44 @@ class GoogleImageScraper(ImageScraper):
         if not after is None:
             urlsearchterm += "+"+quote("after:{:04d}-{:02d}-{:02d}".format(after.year, after.month, after.day), safe="")
 
-        driver.get(f"https://www.google.com/search?q={urlsearchterm}&tbm=isch")
-        
-        perf_time = time.time()
+        return f"{GoogleImageScraper.search_base_url}?q={urlsearchterm}&tbm=isch"
 
-        starttime = time.time()
+    @staticmethod
+    def parse_image_links(page_source: str) -> List[str]:
+        img_links = []
 
-        timeout_s = 50
+        for match in GoogleImageScraper._imgurl_pattern.finditer(page_source):
+            img_links.append(unquote(html.unescape(match.group(1))))
 
-        num_pages = 0
+        for match in GoogleImageScraper._inline_pattern.finditer(page_source):
+            try:
+                img_link = json.loads('"' + match.group(1) + '"')
+            except ValueError:
+                continue
 
-        while num_pages < pages_num or pages_num == -1:
-            ActionChains(driver).send_keys(Keys.PAGE_DOWN).perform()
-            time.sleep(0.25)
-            
-            if time.time() - starttime > timeout_s:
-                driver.refresh()
-                starttime = time.time()
+            host = urlparse(img_link).hostname or ""
+
+            if any([host == ignored or host.endswith("." + ignored) for ignored in GoogleImageScraper._ignored_hosts]):
                 continue
 
-            elements = driver.find_elements(By.XPATH, "/html/body/div[2]/c-wiz/div[3]/div[1]/div/div/div/div/div[1]/div[2]/div[1]/div[2]/div[1]/div")
+            img_links.append(img_link)
+
+        # Same link shows up in both places, keep the page order
+        return list(dict.fromkeys(img_links))
+
+    @staticmethod
+    def fetch_image_links(searchterm: str, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
+        num_pages = GoogleImageScraper.max_http_pages if pages_num == -1 else min(max(pages_num, 1), GoogleImageScraper.max_http_pages)
+
+        search_url = GoogleImageScraper.search_url(searchterm, before, after)
+        page_urls = [search_url] + [f"{search_url}&{GoogleImageScraper.page_param}={page}" for page in range(1, num_pages)]
+
+        return ImageScraper.fetch_pages(page_urls, GoogleImageScraper.parse_image_links)
+
+    @staticmethod
+    def _click_image_links(driver: RemoteWebDriver) -> List[str]:
+        from selenium.webdriver.common.by import By
 
-            elements_button = driver.find_elements(By.XPATH, "/html/body/div[2]/c-wiz/div[3]/div[1]/div/div/div/div/div[1]/div[2]/div[2]/input")
-            
-            if len(elements) > 0:
-                if elements[0].text == "Looks like you've reached the end":
-                    break
-        
-            if len(elements_button) > 0:
-                if elements_button[0].is_displayed():
-                    elements_button[0].click()
-                    num_pages += 1
-                    starttime = time.time()
-        
-        
         elements_images = driver.find_elements(By.CSS_SELECTOR, "div.BUooTd")
         
         [elm.click() for elm in elements_images]
@@ -69,25 +108,45 @@ class GoogleImageScraper(ImageScraper):
 
         
         elements_images = driver.find_elements(By.XPATH, "/html/body/div[2]/c-wiz/div[3]/div[1]/div/div/div/div/div[1]/div[1]/span/div[1]/div[1]/div/div/a[1]")
-        
-        # print("Browser time: {:.2f}".format(time.time() - perf_time))
-        perf_time = time.time()
-        
 
         elm_links = [elm.get_attribute("href") for elm in elements_images]
 
-        # print("Link pulling time: {:.2f}".format(time.time() - perf_time))
-
-        perf_time = time.time()
-
         img_links = []
         for elm in elm_links:
             try:
                 img_links.append(parse_qs(urlparse(elm).query)["imgurl"][0])
             except Exception as e:
-                #print(elm.get_attribute("href"))
                 continue
-        # print("Processing time: {:.2f}".format(time.time() - perf_time))
+
+        return img_links
+
+    @staticmethod
+    def get_image_links(searchterm: str, driver: RemoteWebDriver, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
+        if (not before is None and not isinstance(before, datetime.date)) or (not after is None and not isinstance(after, datetime.date)):
+            raise TypeError
+
+        with Metrics.task_timer("page_load_seconds"):
+            driver.get(GoogleImageScraper.search_url(searchterm, before, after))
+
+        paginator = GoogleImageScraper.create_paginator()
+
+        with Metrics.task_timer("pagination_seconds"):
+            num_pages = paginator.run(driver, pages_num)
+
+        Metrics.task_record("pages_total", num_pages)
+
+        for page_timing in paginator.page_timings:
+            Metrics.task_record("page_seconds", page_timing)
+
+        img_links = []
+
+        with Metrics.task_timer("link_extraction_seconds"):
+            if GoogleImageScraper.link_extraction == GoogleImageScraper.LinkExtraction.Bulk:
+                img_links = GoogleImageScraper.parse_image_links(driver.page_source)
+
+            if len(img_links) == 0:
+                Metrics.task_record("click_fallbacks_total", 1)
+                img_links = GoogleImageScraper._click_image_links(driver)
 
         return img_links
 
@@ -0,0 +1,145 @@
+import asyncio, time
+
+# Just for typing
+from typing import Dict
+
+
+class HostScheduler:
+    # Token bucket per host so no single host gets every download worker at once,
+    # and a circuit breaker that parks hosts which keep timing out or erroring
+
+    class HostState:
+        tokens: float
+        updated: float
+        not_before: float
+
+        failures: int
+        open_until: float
+        num_opened: int
+        probing: bool
+
+        def __init__(self, burst: float) -> None:
+            self.tokens = burst
+            self.updated = time.monotonic()
+            self.not_before = 0
+
+            self.failures = 0
+            self.open_until = 0
+            self.num_opened = 0
+            self.probing = False
+
+    rate_per_host: float | None
+    burst: float
+
+    failure_threshold: int
+    open_duration_s: float
+    max_open_duration_s: float
+
+    hosts: Dict[str, HostState]
+
+    def __init__(self, rate_per_host: float | None = None, burst: float | None = None, failure_threshold: int = 5,
+                        open_duration_s: float = 30, max_open_duration_s: float = 600) -> None:
+
+        if rate_per_host is not None and rate_per_host <= 0:
+            raise ValueError("rate_per_host must be > 0")
+
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be >= 1")
+
+        self.rate_per_host = rate_per_host
+        self.burst = burst if burst is not None else max(rate_per_host or 1, 1)
+
+        self.failure_threshold = failure_threshold
+        self.open_duration_s = open_duration_s
+        self.max_open_duration_s = max_open_duration_s
+
+        self.hosts = {}
+
+    def _state(self, host: str) -> HostState:
+        if host not in self.hosts:
+            self.hosts[host] = HostScheduler.HostState(self.burst)
+
+        return self.hosts[host]
+
+    def is_parked(self, host: str) -> bool:
+        state = self._state(host)
+
+        if state.open_until == 0:
+            return False
+
+        # Once the park runs out a single probe is let through, the rest stay parked until it reports back
+        return state.probing or time.monotonic() < state.open_until
+
+    def park_remaining_s(self, host: str) -> float:
+        # Zero while a probe is out, its verdict may park the host again
+        return max(self._state(host).open_until - time.monotonic(), 0)
+
+    async def acquire(self, host: str) -> bool:
+        state = self._state(host)
+
+        while True:
+            if self.is_parked(host):
+                return False
+
+            now = time.monotonic()
+
+            # Retry-After from the host holds back every worker, not just the one that got it
+            if now < state.not_before:
+                await asyncio.sleep(state.not_before - now)
+                continue
+
+            if self.rate_per_host is None:
+                break
+
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate_per_host)
+            state.updated = now
+
+            if state.tokens >= 1:
+                state.tokens -= 1
+                break
+
+            await asyncio.sleep((1 - state.tokens) / self.rate_per_host)
+
+        if state.open_until != 0:
+            state.probing = True
+
+        return True
+
+    def is_probing(self, host: str) -> bool:
+        return self._state(host).probing
+
+    def end_probe(self, host: str) -> None:
+        # The probe ended without a verdict on the host, the next request through acquire probes again
+        self._state(host).probing = False
+
+    def delay(self, host: str, delay_s: float) -> None:
+        state = self._state(host)
+        state.not_before = max(state.not_before, time.monotonic() + delay_s)
+
+    def report_success(self, host: str) -> None:
+        state = self._state(host)
+
+        state.failures = 0
+        state.open_until = 0
+        state.num_opened = 0
+        state.probing = False
+
+    def report_failure(self, host: str) -> bool:
+        state = self._state(host)
+
+        # Downloads that were already in flight when the host got parked
+        if not state.probing and time.monotonic() < state.open_until:
+            return False
+
+        state.failures += 1
+
+        # A failed probe parks the host again straight away, for longer each time
+        if state.probing or state.failures >= self.failure_threshold:
+            state.open_until = time.monotonic() + min(self.open_duration_s * 2**state.num_opened, self.max_open_duration_s)
+            state.num_opened += 1
+            state.failures = 0
+            state.probing = False
+
+            return True
+
+        return False
@@ -0,0 +1,558 @@
+from enum import IntEnum
+
+import asyncio, contextlib, hashlib, itertools, os, random, time
+
+import aiohttp
+
+from FileNumbering import FileNumbering
+from ImageIndex import ImageIndex
+from ImageValidator import ImageValidator
+from Metrics import Metrics
+from HostScheduler import HostScheduler
+from ByteScheduler import ByteScheduler
+from PostProcessor import PostProcessor
+from ScrapeJournal import ScrapeJournal
+
+# Just for typing
+from typing import Callable, Dict, Iterable, List, Set
+from concurrent.futures import Executor
+from types import SimpleNamespace
+from urllib.parse import urlparse
+from os import PathLike
+
+
+class ImageDownloader:
+    class Result(IntEnum):
+        Failed = 0
+        Saved = 1
+        Duplicate = 2
+        Rejected = 3
+        # The host was parked by the circuit breaker, worth trying again in a later run
+        Parked = 4
+        # The byte budget ran out, left for a later run as well
+        OverBudget = 5
+
+    class TransientError(Exception):
+        retry_after_s: float | None
+        # Timeouts and refused connections say something about the host, a 503 may only be about one URL
+        host_level: bool
+
+        def __init__(self, reason: str, retry_after_s: float | None = None, host_level: bool = False) -> None:
+            super().__init__(reason)
+            self.retry_after_s = retry_after_s
+            self.host_level = host_level
+
+    user_agent = "Mozilla/5.0 (X11; Linux x86_64; rv:101.0) Gecko/20100101 Firefox/101.0"
+
+    # Temp files live here until complete, a rename within one file system is atomic
+    partial_dir_name = ".partial"
+
+    # Worth another try, anything else from the host is an answer
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    save_dir: str | PathLike
+    numbering: FileNumbering
+
+    max_connections: int
+    max_connections_per_host: int
+    chunk_size: int
+    timeout_s: float
+    connect_timeout_s: float
+    read_timeout_s: float
+    queue_size: int
+
+    max_retries: int
+    backoff_base_s: float
+    backoff_max_s: float
+
+    index: ImageIndex | None
+    validator: ImageValidator
+    metrics: Metrics
+    scheduler: HostScheduler
+    byte_scheduler: ByteScheduler | None
+
+    # Larger files are rejected from their Content-Length, or once that many bytes have arrived without one
+    max_file_bytes: int | None
+    # Ask for the Content-Length with a HEAD first, for hosts where cutting a GET short is expensive
+    head_requests: bool
+
+    # Decoding runs here when set, in threads otherwise
+    executor: Executor | None
+    postprocessor: PostProcessor | None
+
+    # Gets every download's status, Saved in the same step as the image is renamed into place
+    journal: ScrapeJournal | None
+
+    # Shared by downloaders whose workers together may only run so many downloads at once, like a batch's categories
+    slots: asyncio.Semaphore | None
+
+    def __init__(self, save_dir: str | PathLike, numbering: FileNumbering | None = None, max_connections: int = 8,
+                        max_connections_per_host: int = 4, chunk_size: int = 64*1024, timeout_s: float = 120,
+                        queue_size: int | None = None, index: ImageIndex | None = None, validator: ImageValidator | None = None,
+                        metrics: Metrics | None = None, connect_timeout_s: float = 10, read_timeout_s: float = 30,
+                        max_retries: int = 3, backoff_base_s: float = 0.5, backoff_max_s: float = 30,
+                        scheduler: HostScheduler | None = None, postprocessor: PostProcessor | None = None, executor: Executor | None = None,
+                        byte_scheduler: ByteScheduler | None = None, max_file_bytes: int | None = None, head_requests: bool = False,
+                        journal: ScrapeJournal | None = None) -> None:
+
+        if max_connections < 1:
+            raise ValueError("max_connections must be >= 1")
+
+        if max_connections_per_host < 0:
+            raise ValueError("max_connections_per_host must be >= 0")
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be >= 1")
+
+        if queue_size is not None and queue_size < 1:
+            raise ValueError("queue_size must be >= 1")
+
+        if max_retries < 0:
+            raise ValueError("max_retries must be >= 0")
+
+        if max_file_bytes is not None and max_file_bytes < 1:
+            raise ValueError("max_file_bytes must be >= 1")
+
+        self.save_dir = save_dir
+        self._owns_numbering = numbering is None
+        self.numbering = numbering if numbering is not None else FileNumbering(save_dir)
+
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.chunk_size = chunk_size
+        self.timeout_s = timeout_s
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
+        self.queue_size = queue_size if queue_size is not None else max_connections*4
+
+        self.index = index
+        self.validator = validator if validator is not None else ImageValidator()
+        self.metrics = metrics if metrics is not None else Metrics()
+
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.scheduler = scheduler if scheduler is not None else HostScheduler()
+        self.byte_scheduler = byte_scheduler
+
+        self.max_file_bytes = max_file_bytes
+        self.head_requests = head_requests
+
+        self.postprocessor = postprocessor
+        self.executor = executor if executor is not None or postprocessor is None else postprocessor.executor
+
+        self.journal = journal
+        self.slots = None
+
+        self._temp_nums = itertools.count()
+
+        # URLs of parked hosts wait out the park and go back on the queue, up to max_retries parks each
+        self._park_counts: Dict[str, int] = {}
+        self._park_waits: Set[asyncio.Task] = set()
+
+    @property
+    def partial_dir(self) -> str:
+        return os.path.join(self.save_dir, ImageDownloader.partial_dir_name)
+
+    def _next_save_path(self, extension: str) -> str:
+        # Only ever called from the event loop thread, no locking needed
+        return os.path.join(self.save_dir, self.numbering.file_name_for(self.numbering.next(), extension))
+
+    def _next_temp_path(self) -> str:
+        return os.path.join(self.partial_dir, "{pid}-{num}.part".format(pid=os.getpid(), num=next(self._temp_nums)))
+
+    def clean_partial(self) -> None:
+        # Left behind by killed runs, they never made it to a numbered name
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+        for file in os.listdir(self.partial_dir):
+            os.remove(os.path.join(self.partial_dir, file))
+
+    @staticmethod
+    def create_trace_config() -> aiohttp.TraceConfig:
+        # Fills the timings dict passed as trace_request_ctx, reused connections skip dns and connect
+        trace_config = aiohttp.TraceConfig()
+
+        def on_start(name: str) -> Callable:
+            async def handler(session: aiohttp.ClientSession, context: SimpleNamespace, params) -> None:
+                setattr(context, name, time.perf_counter())
+            return handler
+
+        def on_end(name: str, start_name: str) -> Callable:
+            async def handler(session: aiohttp.ClientSession, context: SimpleNamespace, params) -> None:
+                if context.trace_request_ctx is not None and hasattr(context, start_name):
+                    context.trace_request_ctx[name] = time.perf_counter() - getattr(context, start_name)
+            return handler
+
+        trace_config.on_request_start.append(on_start("request_start"))
+        trace_config.on_connection_queued_start.append(on_start("queued_start"))
+        trace_config.on_connection_queued_end.append(on_end("connection_wait_seconds", "queued_start"))
+        trace_config.on_dns_resolvehost_start.append(on_start("dns_start"))
+        trace_config.on_dns_resolvehost_end.append(on_end("dns_seconds", "dns_start"))
+        trace_config.on_connection_create_start.append(on_start("connect_start"))
+        trace_config.on_connection_create_end.append(on_end("connect_seconds", "connect_start"))
+        # Request end fires once the response headers are in
+        trace_config.on_request_end.append(on_end("ttfb_seconds", "request_start"))
+
+        return trace_config
+
+    def create_session(self) -> aiohttp.ClientSession:
+        # limit_per_host=0 means no per host limit in aiohttp
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections_per_host)
+
+        return aiohttp.ClientSession(connector=connector, headers={"User-Agent": self.user_agent},
+                                     timeout=aiohttp.ClientTimeout(total=self.timeout_s, sock_connect=self.connect_timeout_s, sock_read=self.read_timeout_s),
+                                     trace_configs=[ImageDownloader.create_trace_config()])
+
+    async def download(self, session: aiohttp.ClientSession, url: str) -> Result:
+        timings = {}
+        start = time.perf_counter()
+
+        result = await self._download_with_retries(session, url, timings)
+
+        timings["download_seconds"] = time.perf_counter() - start
+
+        for name, value in timings.items():
+            self.metrics.record(name, value)
+
+        self.metrics.inc(f"downloads_{result.name.lower()}_total")
+        self.metrics.event("download", url=url, result=result.name, **timings)
+
+        # Saved was recorded by commit
+        if self.journal is not None and result != ImageDownloader.Result.Saved:
+            self.journal.set_link_status(url, ScrapeJournal.LinkStatus[result.name])
+
+        return result
+
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> float | None:
+        # Only the seconds form, dates are rare on 429 and 503
+        try:
+            return float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            return None
+
+    def _backoff(self, attempt: int, retry_after_s: float | None) -> float:
+        # Full jitter so workers that failed together don't come back together
+        delay = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2**attempt))
+
+        if retry_after_s is not None:
+            delay = max(delay, min(retry_after_s, self.backoff_max_s))
+
+        return delay
+
+    async def _download_with_retries(self, session: aiohttp.ClientSession, url: str, timings: Dict[str, float]) -> Result:
+        host = urlparse(url).hostname or ""
+
+        if self.byte_scheduler is not None:
+            paused_s = await self.byte_scheduler.wait_for_space(self.save_dir)
+
+            if paused_s > 0:
+                timings["disk_pause_seconds"] = paused_s
+
+            if not self.byte_scheduler.fits():
+                return ImageDownloader.Result.OverBudget
+
+        for attempt in range(self.max_retries + 1):
+            if not await self.scheduler.acquire(host):
+                return ImageDownloader.Result.Parked
+
+            # Set by acquire when the park has run out, no other download gets through until this one reports
+            probe = self.scheduler.is_probing(host)
+
+            try:
+                result = await self._download(session, url, timings)
+            except ImageDownloader.TransientError as e:
+                if e.host_level or attempt == self.max_retries:
+                    if self.scheduler.report_failure(host):
+                        self.metrics.inc("hosts_parked_total")
+                        print(f"parking {host} after repeated failures: {e}")
+                elif probe:
+                    # A 429 or 503 for this URL says nothing about the host, the retry probes again
+                    self.scheduler.end_probe(host)
+
+                if attempt == self.max_retries:
+                    return ImageDownloader.Result.Failed
+
+                delay = self._backoff(attempt, e.retry_after_s)
+
+                if e.retry_after_s is not None:
+                    self.scheduler.delay(host, delay)
+
+                timings["retries_total"] = attempt + 1
+
+                await asyncio.sleep(delay)
+                continue
+
+            # 404s and rejected files still mean the host is answering
+            self.scheduler.report_success(host)
+
+            return result
+
+    async def _download(self, session: aiohttp.ClientSession, url: str, timings: Dict[str, float]) -> Result:
+        temp_path = None
+        reserved_bytes, num_bytes = 0, 0
+
+        try:
+            if self.head_requests:
+                async with session.head(url, allow_redirects=True) as response:
+                    # Hosts that don't answer HEAD properly are left to the GET
+                    size_result = self._check_size(response.content_length) if response.status == 200 else None
+
+                if size_result is not None:
+                    return size_result
+
+            async with session.get(url, trace_request_ctx=timings) as response:
+                if response.status in ImageDownloader.retry_statuses:
+                    raise ImageDownloader.TransientError(f"HTTP {response.status}", ImageDownloader._retry_after(response))
+
+                if response.status != 200:
+                    return ImageDownloader.Result.Failed
+
+                size_result = self._check_size(response.content_length)
+
+                if size_result is not None:
+                    return size_result
+
+                if self.byte_scheduler is not None:
+                    reserved_bytes = self._initial_reservation(response.content_length)
+
+                    if not self.byte_scheduler.reserve(reserved_bytes):
+                        reserved_bytes = 0
+                        return ImageDownloader.Result.OverBudget
+
+                content_type = response.headers.get('content-type', '').split(';')[0].strip()
+
+                # Servers often send images as octet-stream, but never as text
+                if content_type.startswith("text/"):
+                    return ImageDownloader.Result.Rejected
+
+                # Images only get a number once they are known not to be duplicates
+                temp_path = self._next_temp_path()
+                content_hash = hashlib.sha256()
+
+                header = bytearray()
+                verdict, image_format = ImageValidator.Verdict.Pending, None
+
+                transfer_start = time.perf_counter()
+
+                with open(temp_path, 'wb') as file:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        # Undersized, oversized and non-image responses are dropped as soon as the header is readable
+                        if verdict == ImageValidator.Verdict.Pending:
+                            header += chunk
+                            verdict, image_format = self.validator.check_header(bytes(header))
+
+                            if verdict == ImageValidator.Verdict.Rejected:
+                                return ImageDownloader.Result.Rejected
+
+                        if self.byte_scheduler is not None and num_bytes + len(chunk) > reserved_bytes:
+                            # Longer than the Content-Length or no Content-Length at all, the rest has to fit what is left
+                            if not self.byte_scheduler.reserve(num_bytes + len(chunk) - reserved_bytes):
+                                return ImageDownloader.Result.OverBudget
+
+                            reserved_bytes = num_bytes + len(chunk)
+
+                        content_hash.update(chunk)
+                        file.write(chunk)
+                        num_bytes += len(chunk)
+
+                        if self.byte_scheduler is not None:
+                            await self.byte_scheduler.consume(len(chunk))
+
+                        if self.max_file_bytes is not None and num_bytes > self.max_file_bytes:
+                            return ImageDownloader.Result.Rejected
+
+                timings["transfer_seconds"] = time.perf_counter() - transfer_start
+                timings["response_bytes"] = num_bytes
+
+                if verdict == ImageValidator.Verdict.Pending:
+                    verdict, image_format = self.validator.check_header(bytes(header), complete=True)
+
+                    if verdict == ImageValidator.Verdict.Rejected:
+                        return ImageDownloader.Result.Rejected
+
+            if self.validator.transforms:
+                decoded, image_format = await asyncio.get_running_loop().run_in_executor(self.executor, self.validator.transform, temp_path, image_format)
+
+                if not decoded:
+                    return ImageDownloader.Result.Rejected
+
+            extension = ImageValidator.format_extension(image_format)
+
+            perceptual_hash = None
+
+            if self._perceptual_hashes:
+                # Decoding is CPU bound, keep it off the event loop
+                perceptual_hash = await asyncio.get_running_loop().run_in_executor(self.executor, ImageIndex.perceptual_hash, temp_path)
+
+            # After any resize or re-encode, so this is what ends up on disk
+            num_bytes_written = os.path.getsize(temp_path)
+
+            result = await self._store(temp_path, extension, content_hash.hexdigest(), perceptual_hash, url)
+
+            if result == ImageDownloader.Result.Saved:
+                timings["bytes_written_total"] = num_bytes_written
+
+            return result
+
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            # Timeouts, resets and truncated bodies
+            raise ImageDownloader.TransientError(type(e).__name__, host_level=True) from e
+
+        except (aiohttp.ClientError, OSError, ValueError):
+            return ImageDownloader.Result.Failed
+
+        finally:
+            # Never leave a partial or duplicate image behind
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+            if reserved_bytes > num_bytes:
+                self.byte_scheduler.release(reserved_bytes - num_bytes)
+
+    def _initial_reservation(self, content_length: int | None) -> int:
+        if content_length is not None:
+            return content_length
+
+        # One chunk, or whatever is left of the budget if that is less
+        remaining_bytes = self.byte_scheduler.remaining_bytes
+
+        return min(self.chunk_size, remaining_bytes) if remaining_bytes else self.chunk_size
+
+    def _check_size(self, content_length: int | None) -> Result | None:
+        if content_length is None:
+            return None
+
+        if self.max_file_bytes is not None and content_length > self.max_file_bytes:
+            return ImageDownloader.Result.Rejected
+
+        # May fit in the next run's budget
+        if self.byte_scheduler is not None and not self.byte_scheduler.fits(content_length):
+            return ImageDownloader.Result.OverBudget
+
+        return None
+
+    @property
+    def _perceptual_hashes(self) -> bool:
+        return self.index is not None and self.index.perceptual_distance is not None
+
+    def commit(self, temp_path: str | PathLike, extension: str, content_hash: str, perceptual_hash: int | None = None, url: str | None = None) -> Result:
+        # Dedup check and numbering, a duplicate is left at temp_path for the caller to remove
+        if self.index is not None and self.index.is_duplicate(content_hash, perceptual_hash):
+            return ImageDownloader.Result.Duplicate
+
+        path = self._next_save_path(extension)
+
+        os.replace(temp_path, path)
+
+        if self.journal is not None and url is not None:
+            self.journal.set_link_status(url, ScrapeJournal.LinkStatus.Saved)
+
+        if self.index is not None:
+            self.index.add(content_hash, os.path.basename(path), perceptual_hash)
+
+        if self.postprocessor is not None:
+            self.postprocessor.add(path, url, content_hash)
+
+        return ImageDownloader.Result.Saved
+
+    async def _store(self, temp_path: str | PathLike, extension: str, content_hash: str, perceptual_hash: int | None, url: str | None = None) -> Result:
+        # No awaits in commit, so concurrent downloads of the same image can't both pass the check
+        return self.commit(temp_path, extension, content_hash, perceptual_hash, url)
+
+    async def consume(self, session: aiohttp.ClientSession, queue: asyncio.Queue, on_result: Callable[[str, Result], None] | None = None) -> int:
+        num_saved = 0
+
+        while True:
+            url = await queue.get()
+
+            try:
+                # None is the shutdown sentinel, one is sent per worker
+                if url is None:
+                    return num_saved
+
+                async with self.slots if self.slots is not None else contextlib.nullcontext():
+                    result = await self.download(session, url)
+
+                if result == ImageDownloader.Result.Parked and self.requeue_parked(queue, url):
+                    continue
+
+                self._park_counts.pop(url, None)
+
+                if result == ImageDownloader.Result.Saved:
+                    num_saved += 1
+
+                if on_result is not None:
+                    on_result(url, result)
+            finally:
+                queue.task_done()
+
+    def requeue_parked(self, queue: asyncio.Queue, url: str) -> bool:
+        host = urlparse(url).hostname or ""
+
+        # Turned away while another URL probes the host doesn't count as a park
+        if not self.scheduler.is_probing(host):
+            self._park_counts[url] = self._park_counts.get(url, 0) + 1
+
+        if self._park_counts.get(url, 0) > self.max_retries:
+            del self._park_counts[url]
+            return False
+
+        async def wait() -> None:
+            while self.scheduler.is_parked(host):
+                await asyncio.sleep(max(self.scheduler.park_remaining_s(host), self.backoff_base_s))
+
+            await queue.put(url)
+
+        task = asyncio.create_task(wait())
+        task.add_done_callback(self._park_waits.discard)
+        self._park_waits.add(task)
+
+        return True
+
+    async def join_parked(self, queue: asyncio.Queue) -> None:
+        # Parked URLs have to be back on the queue and through the workers before these can stop
+        await queue.join()
+
+        while len(self._park_waits) > 0:
+            await asyncio.gather(*self._park_waits)
+            await queue.join()
+
+    def create_queue(self) -> asyncio.Queue:
+        # Bounded so producers are throttled to the download rate
+        return asyncio.Queue(maxsize=self.queue_size)
+
+    def start_workers(self, session: aiohttp.ClientSession, queue: asyncio.Queue, on_result: Callable[[str, Result], None] | None = None) -> List[asyncio.Task]:
+        return [asyncio.create_task(self.consume(session, queue, on_result)) for _ in range(self.max_connections)]
+
+    async def stop_workers(self, queue: asyncio.Queue, workers: List[asyncio.Task]) -> int:
+        await self.join_parked(queue)
+
+        for _ in workers:
+            await queue.put(None)
+
+        return sum(await asyncio.gather(*workers))
+
+    async def download_all(self, urls: Iterable[str], on_result: Callable[[str, Result], None] | None = None) -> int:
+        queue = self.create_queue()
+
+        self.clean_partial()
+
+        async with self.create_session() as session:
+            workers = self.start_workers(session, queue, on_result)
+
+            try:
+                for url in urls:
+                    await queue.put(url)
+
+                return await self.stop_workers(queue, workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+
+                if self._owns_numbering:
+                    self.numbering.close()
+
+    def run(self, urls: Iterable[str], on_result: Callable[[str, Result], None] | None = None) -> int:
+        return asyncio.run(self.download_all(urls, on_result))
@@ -0,0 +1,139 @@
+import hashlib, os, pathlib, sqlite3
+
+from PIL import Image
+from tqdm import tqdm
+
+# Just for typing
+from typing import Dict, List
+from os import PathLike
+
+
+class ImageIndex:
+    file_name = ".image_index.sqlite"
+
+    hash_bits = 64
+
+    perceptual_distance: int | None
+
+    connection: sqlite3.Connection
+
+    # Stored as the database's user_version once the images saved before the index existed are in it
+    backfilled_version = 1
+
+    def __init__(self, save_location: str | PathLike | None = None, perceptual_distance: int | None = None, backfill: bool = False) -> None:
+        if perceptual_distance is not None and not 0 <= perceptual_distance < ImageIndex.hash_bits:
+            raise ValueError(f"perceptual_distance must be None or between 0 and {ImageIndex.hash_bits - 1}")
+
+        self.perceptual_distance = perceptual_distance
+
+        if save_location is None:
+            path = ":memory:"
+        else:
+            os.makedirs(save_location, exist_ok=True)
+            path = os.path.join(save_location, ImageIndex.file_name)
+
+        self.connection = sqlite3.connect(path)
+
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        self.connection.execute("CREATE TABLE IF NOT EXISTS images (content_hash TEXT PRIMARY KEY, perceptual_hash TEXT, file_name TEXT NOT NULL)")
+        self.connection.commit()
+
+        # Perceptual hashes are split into distance+1 bands, by pigeonhole two hashes within
+        # the distance share at least one band exactly, so lookups never scan the whole index
+        self._bands: List[Dict[int, List[int]]] = []
+
+        if perceptual_distance is not None:
+            self._bands = [{} for _ in range(perceptual_distance + 1)]
+
+            for (perceptual_hash,) in self.connection.execute("SELECT perceptual_hash FROM images WHERE perceptual_hash IS NOT NULL"):
+                self._add_bands(int(perceptual_hash, 16))
+
+        # Hashing a large existing dataset takes a while, so it is opt-in and only ever done once
+        if backfill and save_location is not None and self.connection.execute("PRAGMA user_version").fetchone()[0] < ImageIndex.backfilled_version:
+            self.add_directory(save_location)
+            self.connection.execute(f"PRAGMA user_version = {ImageIndex.backfilled_version}")
+
+    @staticmethod
+    def content_hash(path: str | PathLike) -> str:
+        content_hash = hashlib.sha256()
+
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(64*1024), b''):
+                content_hash.update(chunk)
+
+        return content_hash.hexdigest()
+
+    @staticmethod
+    def perceptual_hash(path: str | PathLike) -> int | None:
+        # Difference hash, one bit per horizontally adjacent pixel pair of a 9x8 thumbnail
+        try:
+            with Image.open(path) as image:
+                pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+
+        value = 0
+
+        for row in range(8):
+            for col in range(8):
+                value = (value << 1) | int(pixels[row*9 + col] > pixels[row*9 + col + 1])
+
+        return value
+
+    def _band_keys(self, perceptual_hash: int) -> List[int]:
+        num_bands = len(self._bands)
+        width = -(-ImageIndex.hash_bits // num_bands)
+
+        return [(perceptual_hash >> (band * width)) & ((1 << width) - 1) for band in range(num_bands)]
+
+    def _add_bands(self, perceptual_hash: int) -> None:
+        for band, key in zip(self._bands, self._band_keys(perceptual_hash)):
+            band.setdefault(key, []).append(perceptual_hash)
+
+    def contains_content(self, content_hash: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM images WHERE content_hash = ?", (content_hash,)).fetchone() is not None
+
+    def find_similar(self, perceptual_hash: int | None) -> int | None:
+        if perceptual_hash is None or self.perceptual_distance is None:
+            return None
+
+        for band, key in zip(self._bands, self._band_keys(perceptual_hash)):
+            for candidate in band.get(key, []):
+                if (candidate ^ perceptual_hash).bit_count() <= self.perceptual_distance:
+                    return candidate
+
+        return None
+
+    def is_duplicate(self, content_hash: str, perceptual_hash: int | None = None) -> bool:
+        return self.contains_content(content_hash) or self.find_similar(perceptual_hash) is not None
+
+    def _insert(self, content_hash: str, file_name: str, perceptual_hash: int | None = None) -> None:
+        self.connection.execute("INSERT OR IGNORE INTO images (content_hash, perceptual_hash, file_name) VALUES (?, ?, ?)",
+                                (content_hash, None if perceptual_hash is None else f"{perceptual_hash:016x}", file_name))
+
+        if perceptual_hash is not None and self.perceptual_distance is not None:
+            self._add_bands(perceptual_hash)
+
+    def add(self, content_hash: str, file_name: str, perceptual_hash: int | None = None) -> None:
+        self._insert(content_hash, file_name, perceptual_hash)
+        self.connection.commit()
+
+    def add_directory(self, holding_dir: str | PathLike) -> None:
+        # Images saved before the index existed, so they still count as duplicates
+        files = [file for file in os.listdir(holding_dir)
+                 if pathlib.PurePath(file).stem.isdigit() and os.path.isfile(os.path.join(holding_dir, file))]
+
+        for file in tqdm(files, desc="index existing images", disable=not files):
+            path = os.path.join(holding_dir, file)
+            perceptual_hash = ImageIndex.perceptual_hash(path) if self.perceptual_distance is not None else None
+
+            self._insert(ImageIndex.content_hash(path), file, perceptual_hash)
+
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.commit()
+        self.connection.close()
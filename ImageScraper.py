@@ -1,54 +1,54 @@
+from __future__ import annotations
+
 from enum import IntEnum, auto
 
-import datetime, requests, pathlib, math, mimetypes, os
+import asyncio, contextlib, datetime, functools, importlib, os
 from tqdm import tqdm
 
 # Multi-Process
-from functools import partial
-from pebble import ProcessPool
-from multiprocessing.managers import BaseManager
-from multiprocessing import Lock, Value
-
-# Selenium
-from selenium import webdriver
-# Firefox
-from selenium.webdriver.firefox.service import Service as FirefoxService
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
-# Chrome
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-
-# Managers
-from webdriver_manager.firefox import GeckoDriverManager
-from webdriver_manager.chrome import ChromeDriverManager
+from multiprocessing import Lock
+from multiprocessing.util import Finalize
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 
-# Just for typing
-from typing import List, Any, Tuple, Literal
-from selenium.webdriver.common.options import ArgOptions
-from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
-from os import PathLike
+# Downloading
+from HostScheduler import HostScheduler
+from ByteScheduler import ByteScheduler
+from FileNumbering import FileNumbering
 
-# Sketchyness
-import inspect
+# Resuming
+from ScrapeJournal import ScrapeJournal
 
+# Planning
+from QueryPlanner import QueryPlanner
+from SearchCache import SearchCache
 
-class Counter(object):
-    def __init__(self, start_val:int = 0) -> None:
-        self.val = Value('i', start_val)
+# Deduplication
+from ImageIndex import ImageIndex
 
-    def increment(self, n:int = 1) -> None:
-        with self.val.get_lock():
-            self.val.value += n
+# Filtering
+from ImageValidator import ImageValidator
 
-    def get_and_increment(self, n:int = 1) -> int:
-        with self.val.get_lock():
-            old_val = self.val.value
-            self.val.value += n
-            return old_val
+# Post-processing
+from PostProcessor import PostProcessor
 
-    @property
-    def value(self) -> int:
-        return self.val.value
+# Instrumentation
+from Metrics import Metrics
+
+# Selenium, webdriver_manager, pebble, requests and the downloader's aiohttp are imported where they are used,
+# runs that never start a browser or a search process don't pay for them and neither do the search workers
+
+# Just for typing
+from typing import TYPE_CHECKING, Dict, Iterable, List, Any, Tuple, Literal, Callable, Awaitable
+from os import PathLike
+
+if TYPE_CHECKING:
+    from ImageDownloader import ImageDownloader
+    from pebble import ProcessPool
+    from selenium.webdriver.common.options import ArgOptions
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+# Sketchyness
+import inspect
 
 
 class ImageScraper:
@@ -56,8 +56,33 @@ class ImageScraper:
         Firefox = auto()
         Chrome = auto()
 
+    class SearchBackend(IntEnum):
+        Browser = auto()
+        # Plain HTTP requests, parsed the same way as the browser's page source
+        Http = auto()
+        # HTTP first, the browser only for searches that came back empty
+        Auto = auto()
+
+    # Name the engine is registered under, subclasses that set it are registered automatically
+    engine_name: str = "default"
+    # Engines that fetch results over plain HTTP skip the browser entirely
+    needs_driver: bool = True
+    # Engines that can't search by date get one task per term instead of one per date range
+    supports_date_ranges: bool = True
+    # Engines with a fetch_image_links that gets results without a browser
+    supports_http: bool = False
+
+    user_agent = "Mozilla/5.0 (X11; Linux x86_64; rv:101.0) Gecko/20100101 Firefox/101.0"
+    http_timeout_s = 30
+
+    engines: Dict[str, type] = {}
+    # Built in engines are imported on first use
+    engine_modules = {"google": "GoogleImageScraper", "bing": "BingImageScraper", "json": "JsonImageScraper"}
+
     search_terms: str | List[str]
     save_location: str | PathLike
+    search_engines: List[str]
+    search_backend: SearchBackend
     
     date_num_ranges: int
     date_delta: datetime.timedelta | int
@@ -66,17 +91,79 @@ class ImageScraper:
     
     threads_search_num: int
     threads_download_num: int
+    threads_download_host_num: int
+
+    download_retries: int
+    download_host_rate: float | None
+
+    # Bytes per second over all downloads, and bytes per run
+    download_byte_rate: float | None
+    download_byte_budget: int | None
+    max_file_bytes: int | None
+    head_requests: bool
+    # Downloads pause while save_location has less free space than this
+    min_free_bytes: int | None
+
+    pipelined: bool
+    adaptive_date_ranges: bool
+
+    driver_max_uses: int
+
+    journal: bool
+
+    search_cache: bool
+    search_cache_refresh: bool
+
+    dedup: bool
+    dedup_perceptual_distance: int | None
+    dedup_backfill: bool
+
+    min_resolution: Tuple[int, int]
+    max_resolution: Tuple[int, int] | None
+    resize_to: Tuple[int, int] | None
+    save_format: str | None
+    save_mode: str | None
+
+    resize_sizes: List[Tuple[int, int]]
+    manifest_format: str | None
+    postprocess_workers: int | None
+
+    metrics_path: str | PathLike | None
+    metrics_port: int | None
 
     driver_type: DriverType
     driver_headless: bool
     driver_options: ArgOptions | None
 
-    driver_lock = Lock()
+    # Serialises driver starts across forked search workers. Made with the first pool rather than at import,
+    # spawned workers would each make their own and leak its semaphore
+    driver_lock: Any = None
+
+    # Kept warm in each search worker process between tasks, see SearchSpec.get_worker_driver
+    _worker_driver: RemoteWebDriver | None = None
+    _worker_driver_uses: int = 0
+
+    # Roughly how many results a page of search results holds
+    links_per_page_estimate = 100
+
+    # With a search cache, date windows end on multiples of date_delta from here. A Monday, so weekly windows end on Mondays
+    window_epoch = datetime.date(2000, 1, 3)
 
     def __init__(self, search_terms: str | List[str], save_location: str | PathLike | None = None, date_num_ranges: int = 10,
                         date_delta: datetime.timedelta | int = datetime.timedelta(weeks=6*4), pages_num: int = 3, 
                         threads_search_num: int = 4, threads_download_num: int = 8, driver_type: DriverType = DriverType.Firefox, 
-                        driver_headless: bool = True, driver_options: ArgOptions | None = None,
+                        driver_headless: bool = True, driver_options: ArgOptions | None = None, threads_download_host_num: int = 4,
+                        pipelined: bool = False, driver_max_uses: int = 20, journal: bool = True,
+                        dedup: bool = True, dedup_perceptual_distance: int | None = None,
+                        min_resolution: Tuple[int, int] = (0, 0), max_resolution: Tuple[int, int] | None = None,
+                        resize_to: Tuple[int, int] | None = None, save_format: str | None = None,
+                        adaptive_date_ranges: bool = False, metrics_path: str | PathLike | None = None,
+                        metrics_port: int | None = None, download_retries: int = 3, download_host_rate: float | None = 8,
+                        search_engines: List[str] | None = None, search_cache: bool = True, search_cache_refresh: bool = False,
+                        search_backend: SearchBackend = SearchBackend.Auto, save_mode: str | None = None,
+                        resize_sizes: List[Tuple[int, int]] | None = None, manifest_format: str | None = None, postprocess_workers: int | None = None,
+                        download_byte_rate: float | None = None, download_byte_budget: int | None = None, max_file_bytes: int | None = None,
+                        head_requests: bool = False, min_free_bytes: int | None = None, dedup_backfill: bool = False,
                         ) -> None:
         
         if isinstance(search_terms, str):
@@ -122,6 +209,177 @@ class ImageScraper:
         else:
             ImageScraper._raise_type_error(threads_download_num, ["int"])
 
+        if isinstance(threads_download_host_num, int):
+            self.threads_download_host_num = threads_download_host_num
+        else:
+            ImageScraper._raise_type_error(threads_download_host_num, ["int"])
+
+        if isinstance(download_retries, int):
+            if download_retries < 0:
+                raise ValueError("download_retries must be >= 0")
+            self.download_retries = download_retries
+        else:
+            ImageScraper._raise_type_error(download_retries, ["int"])
+
+        if isinstance(download_host_rate, (int, float)) or download_host_rate is None:
+            if download_host_rate is not None and download_host_rate <= 0:
+                raise ValueError("download_host_rate must be > 0")
+            self.download_host_rate = download_host_rate
+        else:
+            ImageScraper._raise_type_error(download_host_rate, ["float", "None"])
+
+        if isinstance(download_byte_rate, (int, float)) or download_byte_rate is None:
+            if download_byte_rate is not None and download_byte_rate <= 0:
+                raise ValueError("download_byte_rate must be > 0")
+            self.download_byte_rate = download_byte_rate
+        else:
+            ImageScraper._raise_type_error(download_byte_rate, ["float", "None"])
+
+        if isinstance(download_byte_budget, int) or download_byte_budget is None:
+            if download_byte_budget is not None and download_byte_budget < 0:
+                raise ValueError("download_byte_budget must be >= 0")
+            self.download_byte_budget = download_byte_budget
+        else:
+            ImageScraper._raise_type_error(download_byte_budget, ["int", "None"])
+
+        if isinstance(max_file_bytes, int) or max_file_bytes is None:
+            if max_file_bytes is not None and max_file_bytes < 1:
+                raise ValueError("max_file_bytes must be >= 1")
+            self.max_file_bytes = max_file_bytes
+        else:
+            ImageScraper._raise_type_error(max_file_bytes, ["int", "None"])
+
+        if isinstance(head_requests, bool):
+            self.head_requests = head_requests
+        else:
+            ImageScraper._raise_type_error(head_requests, ["bool"])
+
+        if isinstance(min_free_bytes, int) or min_free_bytes is None:
+            if min_free_bytes is not None and min_free_bytes < 0:
+                raise ValueError("min_free_bytes must be >= 0")
+            self.min_free_bytes = min_free_bytes
+        else:
+            ImageScraper._raise_type_error(min_free_bytes, ["int", "None"])
+
+        if isinstance(pipelined, bool):
+            self.pipelined = pipelined
+        else:
+            ImageScraper._raise_type_error(pipelined, ["bool"])
+
+        if isinstance(adaptive_date_ranges, bool):
+            self.adaptive_date_ranges = adaptive_date_ranges
+        else:
+            ImageScraper._raise_type_error(adaptive_date_ranges, ["bool"])
+
+        if isinstance(driver_max_uses, int):
+            if driver_max_uses < 1:
+                raise ValueError("driver_max_uses must be >= 1")
+            self.driver_max_uses = driver_max_uses
+        else:
+            ImageScraper._raise_type_error(driver_max_uses, ["int"])
+
+        if isinstance(journal, bool):
+            self.journal = journal
+        else:
+            ImageScraper._raise_type_error(journal, ["bool"])
+
+        if isinstance(search_cache, bool):
+            self.search_cache = search_cache
+        else:
+            ImageScraper._raise_type_error(search_cache, ["bool"])
+
+        if isinstance(search_cache_refresh, bool):
+            self.search_cache_refresh = search_cache_refresh
+        else:
+            ImageScraper._raise_type_error(search_cache_refresh, ["bool"])
+
+        if isinstance(dedup, bool):
+            self.dedup = dedup
+        else:
+            ImageScraper._raise_type_error(dedup, ["bool"])
+
+        if isinstance(dedup_perceptual_distance, int) or dedup_perceptual_distance is None:
+            self.dedup_perceptual_distance = dedup_perceptual_distance
+        else:
+            ImageScraper._raise_type_error(dedup_perceptual_distance, ["int", "None"])
+
+        if isinstance(dedup_backfill, bool):
+            self.dedup_backfill = dedup_backfill
+        else:
+            ImageScraper._raise_type_error(dedup_backfill, ["bool"])
+
+        if ImageScraper._is_resolution(min_resolution):
+            self.min_resolution = min_resolution
+        else:
+            ImageScraper._raise_type_error(min_resolution, ["Tuple[int, int]"])
+
+        if ImageScraper._is_resolution(max_resolution) or max_resolution is None:
+            self.max_resolution = max_resolution
+        else:
+            ImageScraper._raise_type_error(max_resolution, ["Tuple[int, int]", "None"])
+
+        if ImageScraper._is_resolution(resize_to) or resize_to is None:
+            self.resize_to = resize_to
+        else:
+            ImageScraper._raise_type_error(resize_to, ["Tuple[int, int]", "None"])
+
+        if isinstance(save_format, str):
+            self.save_format = ImageValidator.normalize_format(save_format)
+        elif save_format is None:
+            self.save_format = save_format
+        else:
+            ImageScraper._raise_type_error(save_format, ["str", "None"])
+
+        if isinstance(save_mode, str) or save_mode is None:
+            self.save_mode = save_mode
+        else:
+            ImageScraper._raise_type_error(save_mode, ["str", "None"])
+
+        if resize_sizes is None:
+            self.resize_sizes = []
+        elif isinstance(resize_sizes, list) and all([ImageScraper._is_resolution(resize_size) for resize_size in resize_sizes]):
+            self.resize_sizes = resize_sizes
+        else:
+            ImageScraper._raise_type_error(resize_sizes, ["List[Tuple[int, int]]", "None"])
+
+        if isinstance(manifest_format, str) or manifest_format is None:
+            if manifest_format is not None and manifest_format not in PostProcessor.manifest_formats:
+                raise ValueError("manifest_format must be None or one of " + ", ".join(PostProcessor.manifest_formats))
+            self.manifest_format = manifest_format
+        else:
+            ImageScraper._raise_type_error(manifest_format, ["str", "None"])
+
+        if isinstance(postprocess_workers, int) or postprocess_workers is None:
+            if postprocess_workers is not None and postprocess_workers < 1:
+                raise ValueError("postprocess_workers must be >= 1")
+            self.postprocess_workers = postprocess_workers
+        else:
+            ImageScraper._raise_type_error(postprocess_workers, ["int", "None"])
+
+        if search_engines is None:
+            self.search_engines = [type(self).engine_name]
+        elif isinstance(search_engines, list) and len(search_engines) > 0 and all([isinstance(search_engine, str) for search_engine in search_engines]):
+            for search_engine in search_engines:
+                self._engine(search_engine)
+            self.search_engines = search_engines
+        else:
+            ImageScraper._raise_type_error(search_engines, ["List[str]", "None"])
+
+        if isinstance(search_backend, ImageScraper.SearchBackend):
+            self.search_backend = search_backend
+        else:
+            ImageScraper._raise_type_error(search_backend, ["ImageScraper.SearchBackend"])
+
+        if isinstance(metrics_path, PathLike) or isinstance(metrics_path, str) or metrics_path is None:
+            self.metrics_path = metrics_path
+        else:
+            ImageScraper._raise_type_error(metrics_path, ["str", "PathLike", "None"])
+
+        if isinstance(metrics_port, int) or metrics_port is None:
+            self.metrics_port = metrics_port
+        else:
+            ImageScraper._raise_type_error(metrics_port, ["int", "None"])
+
         if isinstance(driver_type, ImageScraper.DriverType):
             self.driver_type = driver_type
         else:
@@ -132,13 +390,59 @@ class ImageScraper:
         else:
             ImageScraper._raise_type_error(driver_headless, ["bool"])
         
-        if isinstance(driver_options, ArgOptions) or driver_options is None:
+        if driver_options is None or ImageScraper._is_driver_options(driver_options):
             self.driver_options = driver_options
         else:
             ImageScraper._raise_type_error(driver_options, ["ArgOptions", "None"])
         
 
 
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+
+        if "engine_name" in cls.__dict__:
+            ImageScraper.engines[cls.engine_name] = cls
+
+    @staticmethod
+    def get_engine(engine_name: str) -> type:
+        if engine_name not in ImageScraper.engines and engine_name in ImageScraper.engine_modules:
+            importlib.import_module(ImageScraper.engine_modules[engine_name])
+
+        if engine_name not in ImageScraper.engines:
+            raise ValueError("unknown engine {} - registered engines are {}".format(engine_name, ", ".join(sorted(set(ImageScraper.engines) | set(ImageScraper.engine_modules)))))
+
+        return ImageScraper.engines[engine_name]
+
+    def _engine(self, engine_name: str) -> type:
+        # The scraper's own engine may be a subclass that overrides get_image_links
+        if engine_name == type(self).engine_name:
+            return type(self)
+
+        return ImageScraper.get_engine(engine_name)
+
+    def _create_search_spec(self) -> SearchSpec:
+        return ImageScraper.SearchSpec({engine_name: self._engine(engine_name) for engine_name in self.search_engines}, self.search_backend,
+                                       self.pages_num, self.driver_type, self.driver_headless, self.driver_options, self.driver_max_uses)
+
+    @property
+    def _needs_driver(self) -> bool:
+        return self._create_search_spec().needs_driver
+
+    @property
+    def _warm_driver(self) -> bool:
+        return self._create_search_spec().warm_driver
+
+    @staticmethod
+    def _is_resolution(var: Any) -> bool:
+        return isinstance(var, tuple) and len(var) == 2 and all([isinstance(elm, int) for elm in var])
+
+    @staticmethod
+    def _is_driver_options(var: Any) -> bool:
+        # Options only come from Selenium, so it is already loaded when there are any
+        from selenium.webdriver.common.options import ArgOptions
+
+        return isinstance(var, ArgOptions)
+
     @staticmethod
     def _raise_type_error(var: Any, valid_types: List[str]):
         if not isinstance(valid_types, list) or not all([ isinstance(valid_type, str) for valid_type in valid_types ]):
@@ -170,9 +474,36 @@ class ImageScraper:
         
 
     @staticmethod
-    def create_driver(driver_type: DriverType = DriverType.Firefox, driver_headless: bool = True, driver_options: ArgOptions | None = None) -> RemoteWebDriver:
+    @functools.cache
+    def install_driver(driver_type: DriverType = DriverType.Firefox) -> str:
+        # Resolved once per process, the managers may check the network for new versions
         webdriver_path = "./webdrivers"
-        
+
+        from webdriver_manager.firefox import GeckoDriverManager
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        try:
+            # webdriver_manager 4 takes the directory through a cache manager instead of path
+            from webdriver_manager.core.driver_cache import DriverCacheManager
+            manager_kwargs = {"cache_manager": DriverCacheManager(webdriver_path)}
+        except ImportError:
+            manager_kwargs = {"path": webdriver_path}
+
+        if driver_type == ImageScraper.DriverType.Firefox:
+            return GeckoDriverManager(**manager_kwargs).install()
+        elif driver_type == ImageScraper.DriverType.Chrome:
+            return ChromeDriverManager(**manager_kwargs).install()
+        else:
+            raise NotImplementedError("Only supported driver types are Firefox and Chrome")
+
+    @staticmethod
+    def create_driver(driver_type: DriverType = DriverType.Firefox, driver_headless: bool = True, driver_options: ArgOptions | None = None) -> RemoteWebDriver:
+        from selenium import webdriver
+        from selenium.webdriver.firefox.service import Service as FirefoxService
+        from selenium.webdriver.firefox.options import Options as FirefoxOptions
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+
         driver = None
         options = None
 
@@ -189,7 +520,7 @@ class ImageScraper:
             if driver_headless:
                 options.add_argument("--headless")
 
-            driver = webdriver.Firefox(options=options, service=FirefoxService(GeckoDriverManager(path=webdriver_path).install()))
+            driver = webdriver.Firefox(options=options, service=FirefoxService(ImageScraper.install_driver(driver_type)))
         elif driver_type == ImageScraper.DriverType.Chrome:
 
             if driver_options is not None:
@@ -203,7 +534,7 @@ class ImageScraper:
             if driver_headless:
                 options.add_argument("--headless")
 
-            driver = webdriver.Chrome(options=options, service=ChromeService(ChromeDriverManager(path=webdriver_path).install()))
+            driver = webdriver.Chrome(options=options, service=ChromeService(ImageScraper.install_driver(driver_type)))
 
         else:
             raise NotImplementedError("Only supported driver types are Firefox and Chrome")
@@ -211,195 +542,626 @@ class ImageScraper:
         return driver
     
     def _create_driver(self) -> RemoteWebDriver:
-        return ImageScraper.create_driver(self.driver_type, self.driver_headless, self.driver_options)
+        return self._create_search_spec().create_driver()
+
+    @staticmethod
+    def is_driver_alive(driver: RemoteWebDriver) -> bool:
+        try:
+            driver.title
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _driver_lock() -> Any:
+        return ImageScraper.driver_lock if ImageScraper.driver_lock is not None else contextlib.nullcontext()
+
+    @staticmethod
+    def _quit_worker_driver() -> None:
+        driver = ImageScraper._worker_driver
+
+        if driver is None:
+            return
+
+        ImageScraper._worker_driver = None
+        ImageScraper._worker_driver_uses = 0
+
+        try:
+            with ImageScraper._driver_lock():
+                driver.quit()
+        except Exception:
+            pass
+
+    def _create_search_pool(self, num_search_workers: int) -> ProcessPool:
+        from pebble import ProcessPool
+
+        spec = self._create_search_spec()
+
+        if spec.needs_driver and ImageScraper.driver_lock is None:
+            ImageScraper.driver_lock = Lock()
+
+        # Resolve the driver binary before forking so workers inherit it. With Auto it is left to the first
+        # fallback to the browser, under the driver lock, so plain HTTP runs never touch the driver managers
+        if spec.warm_driver:
+            ImageScraper.install_driver(self.driver_type)
+
+        return ProcessPool(max_workers=num_search_workers, initializer=spec.init_worker)
     
     @staticmethod
     def create_save_location(holding_dir: PathLike | str = "./", num_new_files: int = 0) -> Tuple[Literal[0], int] | Tuple[int, int]:
+        # num_new_files is no longer needed, file names keep the directory's padding and are never renamed
         if num_new_files < 0: raise ValueError
 
-        if not os.path.exists(holding_dir):
-            os.makedirs(holding_dir)
-            return 0, int(math.log10(num_new_files))+1
-        elif not os.path.isdir(holding_dir):
+        if os.path.exists(holding_dir) and not os.path.isdir(holding_dir):
             raise ValueError
 
-        filenames = [pathlib.PurePath(file).stem for file in os.listdir(holding_dir)]
-        
-        if len(filenames) == 0:
-            return 0, int(math.log10(num_new_files)) + 1
+        numbering = FileNumbering(holding_dir)
 
-        lastfile = max([int(file) if file.isdigit() else 0 for file in filenames])
-        
-        filename_len_cur = 0
-        for file in filenames:
-            if file.isdigit():
-                filename_len_cur = len(file)
-                break
-        
-        num_digits_new = int(math.log10(num_new_files+lastfile))+1
-        
-        if num_digits_new > len(filename_len_cur):
-            ImageScraper.update_file_names(holding_dir, num_digits_new)
+        return numbering.next_num, numbering.padding
 
-        return lastfile + 1, num_digits_new
+    def get_image_links_unpacker(self, before_and_after_search: Tuple[datetime.date, datetime.date, str, str], driver: RemoteWebDriver | None = None) -> List[str]:
+        return self._create_search_spec().get_image_links(before_and_after_search, driver)
 
-    @staticmethod
-    def update_file_names(holding_dir: PathLike | str = "./", num_digits: int = 1) -> None:
-        filenames = os.listdir(holding_dir)
+    def _create_planner(self, date_start: datetime.date | None = None) -> QueryPlanner:
+        date_start = datetime.date.today() if date_start is None else date_start
 
-        for file in filenames:
-            filestem = pathlib.PurePath(file).stem
-            
-            if not filestem.isdigit():
-                continue
-            
-            os.rename(os.path.join(holding_dir, file), os.path.join(holding_dir, "{filename:0{padding}d}{fileending}".format(filename=int(filestem), padding=num_digits, fileending=pathlib.PurePath(file).suffix)))
+        if self.search_cache:
+            # The first window ends on the next grid line, every older window is then the same on every run and hits the cache
+            date_start = self.window_epoch - ((self.window_epoch - date_start) // self.date_delta) * self.date_delta
+
+        # A window returning most of what pages_num pages can hold was probably cut off
+        saturation_links = None if self.pages_num < 0 else int(max(self.pages_num, 1) * self.links_per_page_estimate * 0.8)
+
+        undated_engines = [engine_name for engine_name in self.search_engines if not self._engine(engine_name).supports_date_ranges]
+
+        return QueryPlanner(self.search_terms, date_start, self.date_num_ranges, self.date_delta,
+                            adaptive=self.adaptive_date_ranges, saturation_links=saturation_links,
+                            engines=self.search_engines, undated_engines=undated_engines)
+
+    def _open_search_cache(self) -> SearchCache | None:
+        if not self.search_cache:
+            return None
+
+        return SearchCache(self.save_location, refresh=self.search_cache_refresh)
+
+    def _cache_key(self, date_set: Tuple[datetime.date, datetime.date, str, str]) -> Tuple[str, str, datetime.date | None, datetime.date | None, int]:
+        (before, after, searchterm, engine_name) = date_set
+
+        if not self._engine(engine_name).supports_date_ranges:
+            before, after = None, None
+
+        return (engine_name, searchterm, before, after, self.pages_num)
+
+    def _open_journal(self) -> ScrapeJournal:
+        return ScrapeJournal(self.save_location if self.journal else None)
+
+    def _open_index(self) -> ImageIndex | None:
+        if not self.dedup:
+            return None
+
+        return ImageIndex(self.save_location, self.dedup_perceptual_distance, self.dedup_backfill)
+
+    def _create_validator(self) -> ImageValidator:
+        return ImageValidator(self.min_resolution, self.max_resolution, resize_to=self.resize_to, save_format=self.save_format, save_mode=self.save_mode)
+
+    @property
+    def _postprocessing(self) -> bool:
+        return self._create_validator().transforms or len(self.resize_sizes) > 0 or self.manifest_format is not None
+
+    def _create_postprocess_executor(self) -> ProcessPoolExecutor | None:
+        # Decoding in processes holds neither the event loop nor the GIL
+        if not self._postprocessing:
+            return None
+
+        return ProcessPoolExecutor(max_workers=self.postprocess_workers)
+
+    def _open_postprocessor(self, journal: ScrapeJournal | None = None, executor: ProcessPoolExecutor | None = None) -> PostProcessor | None:
+        if not self._postprocessing:
+            return None
+
+        return PostProcessor(self.save_location, self.resize_sizes, self.manifest_format, executor=executor, workers=self.postprocess_workers,
+                             source=functools.partial(self._link_source, journal) if journal is not None else None)
+
+    def _open_resources(self, executor: ProcessPoolExecutor | None = None) -> Tuple[ScrapeJournal, ImageIndex | None, FileNumbering, SearchCache | None, PostProcessor | None]:
+        resources = []
 
-    @staticmethod
-    def url_download_and_save(save_num_counter: Counter, padding: int, save_dir: str | PathLike, url: str) -> None:
-        img = None
         try:
-            img = requests.get(url, headers={"User-Agent":"Mozilla/5.0 (X11; Linux x86_64; rv:101.0) Gecko/20100101 Firefox/101.0"}, timeout=200)
-        except:
-            return False
+            resources.append(self._open_journal())
+            resources.append(self._open_index())
+            resources.append(FileNumbering(self.save_location))
+            resources.append(self._open_search_cache())
+            resources.append(self._open_postprocessor(resources[0], executor))
+        except BaseException:
+            ImageScraper._close_resources(*resources)
+            raise
 
-        extension = mimetypes.guess_extension(img.headers.get('content-type', '').split(';')[0])
-        
-        if extension == ".html":
-            return False
+        return tuple(resources)
+
+    @staticmethod
+    def _close_resources(journal: ScrapeJournal | None = None, index: ImageIndex | None = None, numbering: FileNumbering | None = None,
+                         search_cache: SearchCache | None = None, postprocessor: PostProcessor | None = None) -> None:
+        # The postprocessor first, it waits for the images still being processed
+        for resource in [postprocessor, journal, numbering, search_cache, index]:
+            if resource is not None:
+                resource.close()
+
+    def _link_source(self, journal: ScrapeJournal, url: str) -> Tuple[str, str, str | None, str | None] | None:
+        source = journal.link_source(url)
+
+        if source is None:
+            return None
+
+        (searchterm, engine_name, before, after) = source
+
+        # The planner's window means nothing to engines that ignore it
+        if engine_name not in self.search_engines or not self._engine(engine_name).supports_date_ranges:
+            before, after = None, None
+
+        return (searchterm, engine_name, before, after)
+
+    def _create_byte_scheduler(self, parent: ByteScheduler | None = None) -> ByteScheduler | None:
+        # A batch's scheduler holds the limits shared by all of its categories
+        if self.download_byte_rate is None and self.download_byte_budget is None and self.min_free_bytes is None:
+            return parent
+
+        return ByteScheduler(self.download_byte_rate, self.download_byte_budget, self.min_free_bytes, parent=parent)
+
+    def _create_downloader(self, numbering: FileNumbering, index: ImageIndex | None, metrics: Metrics | None = None,
+                           postprocessor: PostProcessor | None = None, byte_scheduler: ByteScheduler | None = None,
+                           journal: ScrapeJournal | None = None) -> ImageDownloader:
+        from ImageDownloader import ImageDownloader
+
+        return ImageDownloader(self.save_location, numbering, max_connections=self.threads_download_num,
+                               max_connections_per_host=self.threads_download_host_num, index=index,
+                               validator=self._create_validator(), metrics=metrics, max_retries=self.download_retries,
+                               scheduler=HostScheduler(self.download_host_rate), postprocessor=postprocessor,
+                               byte_scheduler=self._create_byte_scheduler(byte_scheduler), max_file_bytes=self.max_file_bytes,
+                               head_requests=self.head_requests, journal=journal)
+
+    def _open_metrics(self) -> Metrics:
+        metrics = Metrics(self.metrics_path)
+
+        if self.metrics_port is not None:
+            metrics.serve(self.metrics_port)
+
+        return metrics
+
+    class SearchSpec:
+        # What a search worker needs of its scraper, sent with every task instead of the whole scraper.
+        # Engines pickle as references to their classes
+        engines: Dict[str, type]
+        search_backend: ImageScraper.SearchBackend
+        pages_num: int
+
+        driver_type: ImageScraper.DriverType
+        driver_headless: bool
+        driver_options: ArgOptions | None
+        driver_max_uses: int
+
+        def __init__(self, engines: Dict[str, type], search_backend: ImageScraper.SearchBackend, pages_num: int, driver_type: ImageScraper.DriverType,
+                            driver_headless: bool, driver_options: ArgOptions | None, driver_max_uses: int) -> None:
+            self.engines = engines
+            self.search_backend = search_backend
+            self.pages_num = pages_num
+
+            self.driver_type = driver_type
+            self.driver_headless = driver_headless
+            self.driver_options = driver_options
+            self.driver_max_uses = driver_max_uses
 
-        with open(os.path.join(save_dir, "{num:0{padding}d}{extension}".format(num=save_num_counter.get_and_increment(), padding=padding, extension=extension if not extension is None else ".jpg")), 'wb') as file:
-            file.write(img.content)
+        def engine_needs_driver(self, engine: type) -> bool:
+            return engine.needs_driver and not (engine.supports_http and self.search_backend == ImageScraper.SearchBackend.Http)
 
-        return True
+        @property
+        def needs_driver(self) -> bool:
+            return any([self.engine_needs_driver(engine) for engine in self.engines.values()])
 
+        @property
+        def warm_driver(self) -> bool:
+            # With Auto a browser is only started once a fetch comes back empty
+            return any([engine.needs_driver and (not engine.supports_http or self.search_backend == ImageScraper.SearchBackend.Browser)
+                        for engine in self.engines.values()])
+
+        def create_driver(self) -> RemoteWebDriver:
+            with Metrics.task_timer("driver_startup_seconds"):
+                driver = ImageScraper.create_driver(self.driver_type, self.driver_headless, self.driver_options)
+
+            Metrics.task_record("driver_starts_total", 1)
+
+            return driver
+
+        def get_worker_driver(self) -> RemoteWebDriver:
+            if ImageScraper._worker_driver is not None:
+                if ImageScraper._worker_driver_uses >= self.driver_max_uses or not ImageScraper.is_driver_alive(ImageScraper._worker_driver):
+                    ImageScraper._quit_worker_driver()
+
+            if ImageScraper._worker_driver is None:
+                with ImageScraper._driver_lock():
+                    ImageScraper._worker_driver = self.create_driver()
+                ImageScraper._worker_driver_uses = 0
+
+            ImageScraper._worker_driver_uses += 1
+
+            return ImageScraper._worker_driver
+
+        def init_worker(self) -> None:
+            # Worker processes skip atexit, but multiprocessing still runs its finalizers on a clean exit
+            Finalize(None, ImageScraper._quit_worker_driver, exitpriority=10)
+
+            if not self.warm_driver:
+                return
+
+            try:
+                self.get_worker_driver()
+                ImageScraper._worker_driver_uses = 0
+            except Exception as e:
+                # Retried lazily on the first task
+                print(f"driver warm up failed: {e}")
+
+        def get_image_links(self, before_and_after_search: Tuple[datetime.date, datetime.date, str, str], driver: RemoteWebDriver | None = None) -> List[str]:
+            (before, after, searchterm, engine_name) = before_and_after_search
+
+            engine = self.engines[engine_name]
+
+            if not engine.supports_date_ranges:
+                before, after = None, None
+
+            if engine.supports_http and self.search_backend != ImageScraper.SearchBackend.Browser:
+                result = []
+
+                try:
+                    result = engine.fetch_image_links(searchterm, before=before, after=after, pages_num=self.pages_num)
+                except Exception as e:
+                    print(f"{engine_name} http search for {searchterm!r} between {after} and {before} failed: {type(e).__name__}: {e}")
+                    Metrics.task_record("http_errors_total", 1)
+
+                Metrics.task_record("http_searches_total", 1)
+
+                # Consent pages and result pages that need scripts parse to nothing, the browser gets past those
+                if len(result) > 0 or self.search_backend == ImageScraper.SearchBackend.Http:
+                    return result
+
+                Metrics.task_record("browser_fallbacks_total", 1)
+
+            driver_pooled = False
+
+            if driver is None and engine.needs_driver:
+                driver_pooled = True
+                driver = self.get_worker_driver()
+
+            result = []
+            try:
+                result = engine.get_image_links(searchterm, driver, before=before, after=after, pages_num=self.pages_num)
+            except Exception as e:
+                print(f"{engine_name} search for {searchterm!r} between {after} and {before} failed: {type(e).__name__}: {e}")
+                Metrics.task_record("search_errors_total", 1)
+
+                # Recycle a crashed browser instead of handing it to the next task
+                if driver_pooled and not ImageScraper.is_driver_alive(driver):
+                    ImageScraper._quit_worker_driver()
+
+            return result
+
+        def search_task(self, before_and_after_search: Tuple[datetime.date, datetime.date, str, str], driver: RemoteWebDriver | None = None) -> Tuple[List[str], List[Tuple[str, float]]]:
+            # Runs in the search workers, what they recorded goes back to the parent with the links
+            with Metrics.task_timer("search_task_seconds"):
+                result = self.get_image_links(before_and_after_search, driver)
+
+            return result, Metrics.task_drain()
+
+    class SearchPool:
+        # Workers for search tasks, shared by every scraper of a batch since tasks carry the spec of the scraper they belong to
+        def __init__(self, pool: ProcessPool | ThreadPoolExecutor, driver: RemoteWebDriver | None = None, driver_quit: bool = False) -> None:
+            self.pool = pool
+            self.driver = driver
+            self.driver_quit = driver_quit
+
+        def submit(self, task: Callable, date_set: Tuple[datetime.date, datetime.date, str, str]) -> Future:
+            if isinstance(self.pool, ThreadPoolExecutor):
+                return self.pool.submit(task, date_set, driver=self.driver)
+
+            return self.pool.schedule(task, args=(date_set,), timeout=1000)
+
+        def close(self) -> None:
+            if isinstance(self.pool, ThreadPoolExecutor):
+                self.pool.shutdown()
+            else:
+                self.pool.close()
+                self.pool.join()
+
+            if self.driver_quit:
+                self.driver.close()
+
+            # Started lazily by a task that had to fall back to the browser
+            if isinstance(self.pool, ThreadPoolExecutor):
+                ImageScraper._quit_worker_driver()
+
+    def _open_search_pool(self, num_search_workers: int, driver: RemoteWebDriver | None = None, metrics: Metrics | None = None) -> SearchPool:
+        if num_search_workers > 1 and driver is None:
+            return ImageScraper.SearchPool(self._create_search_pool(num_search_workers))
 
-    def get_image_links_unpacker(self, before_and_after_search: Tuple[datetime.date, datetime.date, str], driver: RemoteWebDriver | None = None) -> List[str]:
-        (before, after, searchterm) = before_and_after_search
-        
         driver_quit = False
 
-        if driver is None:
+        if driver is None and self._warm_driver:
             driver_quit = True
-            with self.driver_lock:
-                driver = self.create_driver()
-        
-        result = []
+            driver = self._create_driver()
+
+            if metrics is not None:
+                metrics.merge(Metrics.task_drain())
+
+        # A single driver can only run one search at a time, keep it off the event loop
+        return ImageScraper.SearchPool(ThreadPoolExecutor(max_workers=1), driver, driver_quit)
+
+    def _record_search(self, journal: ScrapeJournal, planner: QueryPlanner, metrics: Metrics, search_cache: SearchCache | None,
+                       date_set: Tuple[datetime.date, datetime.date, str, str], img_links_elm: List[str], records: List[Tuple[str, float]],
+                       cached: bool = False) -> List[str]:
+        (before, after, searchterm, engine_name) = date_set
+
+        # Failed searches come back empty, they are not worth remembering
+        if search_cache is not None and not cached and len(img_links_elm) > 0:
+            search_cache.put(*self._cache_key(date_set), img_links_elm)
+
+        # The journal only hands back links it has not seen before
+        new_links = journal.add_search_results(searchterm, before, after, img_links_elm, engine_name)
+
+        planner.report(date_set, len(img_links_elm), len(new_links))
+
+        timings = metrics.merge(records)
+        metrics.inc("search_tasks_total")
+        metrics.inc("links_found_total", len(img_links_elm))
+        metrics.inc("links_new_total", len(new_links))
+        metrics.event("search", engine=engine_name, searchterm=searchterm, before=before, after=after,
+                      links=len(img_links_elm), new_links=len(new_links), cached=cached, **timings)
+
+        return new_links
+
+    def _resume_search(self, journal: ScrapeJournal, planner: QueryPlanner, metrics: Metrics, search_cache: SearchCache | None, progress: tqdm,
+                       date_set: Tuple[datetime.date, datetime.date, str, str]) -> List[str] | None:
+        # Returns the new links of a search that doesn't have to run, None if it has to
+        (before, after, searchterm, engine_name) = date_set
+
+        # Searches finished by an interrupted run are skipped
+        search_result = journal.search_result(searchterm, before, after, engine_name)
+
+        if search_result is not None:
+            planner.report(date_set, *search_result)
+            return []
+
+        progress.total += 1
+        progress.refresh()
+
+        cached_links = None if search_cache is None else search_cache.get(*self._cache_key(date_set))
+
+        if cached_links is None:
+            return None
+
+        metrics.inc("search_cache_hits_total")
+        progress.update(1)
+
+        return self._record_search(journal, planner, metrics, search_cache, date_set, cached_links, [], cached=True)
+
+    @staticmethod
+    async def _search_outcome(date_set: Tuple[datetime.date, datetime.date, str, str],
+                              search: Awaitable[Tuple[List[str], List[Tuple[str, float]]]]) -> Tuple[List[str], List[Tuple[str, float]]]:
+        (before, after, searchterm, engine_name) = date_set
+
         try:
-            result = self.get_image_links(searchterm, driver, before=before, after=after, pages_num=self.pages_num)
-        except BaseException as e:
-            print(e.__str__)
+            return await search
+        except Exception as e:
+            # Timeouts and worker processes that died
+            print(f"{engine_name} search task for {searchterm!r} between {after} and {before} failed: {type(e).__name__}: {e}")
+            return [], [("search_errors_total", 1)]
+
+    async def _search(self, journal: ScrapeJournal, planner: QueryPlanner, on_links: Callable[[List[str]], Awaitable[None]], driver: RemoteWebDriver | None = None,
+                      metrics: Metrics | None = None, search_pool: SearchPool | None = None, search_slots: asyncio.Semaphore | None = None,
+                      search_progress: tqdm | None = None, search_cache: SearchCache | None = None) -> None:
+        num_search_workers = min(self.threads_search_num, planner.max_tasks)
+
+        if num_search_workers == 0:
+            return
+
+        metrics = metrics if metrics is not None else Metrics()
+
+        pool_owned = search_pool is None
+
+        if pool_owned:
+            search_pool = self._open_search_pool(num_search_workers, driver, metrics)
+
+        # Pickled with every task, the scraper itself stays in this process
+        spec = self._create_search_spec()
+
+        in_flight = {}
+
+        try:
+            with (tqdm(total=0, desc="search", position=0) if search_progress is None else contextlib.nullcontext(search_progress)) as progress:
+
+                async def fill() -> None:
+                    # The planner decides the next windows from what the finished ones returned
+                    while len(in_flight) < num_search_workers:
+                        if search_slots is not None:
+                            # Scrapers in a batch share the workers, only wait for one when nothing of ours is running
+                            if len(in_flight) > 0 and search_slots.locked():
+                                return
+
+                            await search_slots.acquire()
+
+                        date_sets = planner.next_tasks(1)
+
+                        if len(date_sets) == 0:
+                            if search_slots is not None:
+                                search_slots.release()
+                            return
+
+                        date_set = date_sets[0]
+
+                        new_links = self._resume_search(journal, planner, metrics, search_cache, progress, date_set)
+
+                        if new_links is not None:
+                            if search_slots is not None:
+                                search_slots.release()
+
+                            await on_links(new_links)
+                            continue
+
+                        in_flight[asyncio.wrap_future(search_pool.submit(spec.search_task, date_set))] = date_set
+
+                await fill()
+
+                while len(in_flight) > 0:
+                    finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+
+                    for future in finished:
+                        date_set = in_flight.pop(future)
+
+                        if search_slots is not None:
+                            search_slots.release()
+
+                        img_links_elm, records = await ImageScraper._search_outcome(date_set, future)
+
+                        progress.update(1)
+
+                        await on_links(self._record_search(journal, planner, metrics, search_cache, date_set, img_links_elm, records))
+
+                    await fill()
         finally:
-            if driver_quit:
-                with self.driver_lock:
-                    driver.quit()
+            for future in in_flight:
+                future.cancel()
 
-            return result
+                if search_slots is not None:
+                    search_slots.release()
+
+            if pool_owned:
+                search_pool.close()
+
+    async def _run_pipelined(self, journal: ScrapeJournal, numbering: FileNumbering, index: ImageIndex | None, planner: QueryPlanner, driver: RemoteWebDriver | None = None,
+                             metrics: Metrics | None = None, search_cache: SearchCache | None = None, postprocessor: PostProcessor | None = None) -> Tuple[int, int]:
+        # Links left over from an interrupted run go first, read in batches from the journal
+        pending_link_batches = journal.pending_link_batches()
+
+        downloader = self._create_downloader(numbering, index, metrics, postprocessor, journal=journal)
+        downloader.clean_partial()
+
+        num_links = 0
+
+        with tqdm(total=0, desc="download", position=1) as download_progress:
+
+            def on_result(url: str, result: ImageDownloader.Result) -> None:
+                download_progress.update(1)
+
+            queue = downloader.create_queue()
+
+            async def enqueue(img_links_elm: List[str]) -> None:
+                nonlocal num_links
+
+                num_links += len(img_links_elm)
+
+                download_progress.total += len(img_links_elm)
+                download_progress.refresh()
+
+                for img_link in img_links_elm:
+                    await queue.put(img_link)
+
+            async with downloader.create_session() as session:
+                workers = downloader.start_workers(session, queue, on_result=on_result)
+
+                try:
+                    for pending_links in pending_link_batches:
+                        await enqueue(pending_links)
+
+                    await self._search(journal, planner, enqueue, driver, metrics, search_cache=search_cache)
+
+                    num_saved = await downloader.stop_workers(queue, workers)
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+
+        return num_links, num_saved
 
     def run(self, driver: RemoteWebDriver | None = None) -> None:
         
-        img_links = set()
-        
-        # totallinks = 0
-        
-        date_sets = []
+        metrics = self._open_metrics()
+        (journal, index, numbering, search_cache, postprocessor) = self._open_resources()
 
-        for search_term in self.search_terms:
-            date = datetime.date.today()
-    
-            for _ in range(self.date_num_ranges):
-                date_sets.append((date, date - self.date_delta, search_term,))
-                date = date - self.date_delta
-    
-        img_links_result = []
+        try:
+            # An interrupted run is resumed with its original dates
+            planner = self._create_planner(journal.start_run())
 
-        num_search_workers = min(self.threads_search_num, self.date_num_ranges*len(self.search_terms))
+            metrics.event("run_start", search_terms=self.search_terms, save_location=self.save_location, pipelined=self.pipelined)
 
-        if num_search_workers == 1 or driver is not None:
-            driver_quit = False
+            if self.pipelined:
+                with metrics.timer("run_seconds"):
+                    num_links, num_saved = asyncio.run(self._run_pipelined(journal, numbering, index, planner, driver, metrics, search_cache, postprocessor))
 
-            if driver is None:
-                driver_quit = True
-                driver = self._create_driver()
+                print(f"\nfound {num_links} total links in {len(self.search_terms)} search terms, saved {num_saved} out of {num_links}\n")
+            else:
+                # The journal already keeps only new links, the links themselves stay on disk
+                num_links = 0
 
-            try:
-                counter = 0
+                async def on_links(img_links_elm: List[str]) -> None:
+                    nonlocal num_links
+                    num_links += len(img_links_elm)
 
-                for date_set in tqdm(date_sets):
-                    img_links.update(set(self.get_image_links_unpacker(date_set, driver=driver)))
+                with metrics.timer("search_phase_seconds"):
+                    asyncio.run(self._search(journal, planner, on_links, driver, metrics, search_cache=search_cache))
 
-                    # counter += 1
-                    # if counter % self.date_num_ranges == 0:
-                    #     print(f"\nfound {len(img_links)} links after {counter} sessions\n")
+                print(f"\nfound {num_links} total links in {len(self.search_terms)} search terms\n")
 
-            except BaseException as e:
-                if driver_quit:
-                    driver.close()
-                    driver = None
+                # Includes links an interrupted run never got to, but not ones already saved
+                num_pending = journal.num_pending_links()
+                
+                downloader = self._create_downloader(numbering, index, metrics, postprocessor, journal=journal)
 
-                raise e
-            
-            finally:
-                if driver_quit and driver is not None:
-                    driver.close()
-
-        else:
-            with ProcessPool(max_workers=num_search_workers) as pool:
-                img_links_result = pool.map(self.get_image_links_unpacker, date_sets, timeout=1000)
-
-                counter = 0
-                with tqdm(total=len(date_sets)) as progress:
-                    for img_links_elm in img_links_result.result():
-                        img_links.update(set(img_links_elm))
-                        
-                        # counter += 1
-                        # if counter % self.date_num_ranges == 0:
-                        #     print(f"\nfound {len(img_links)} links after {counter:03d} sessions\n")
-                        
+                with tqdm(total=num_pending) as progress, metrics.timer("download_phase_seconds"):
+                    def on_result(url: str, result: ImageDownloader.Result) -> None:
                         progress.update(1)
-            
-            # searchlinks = len(img_links) - totallinks
-            # totallinks = len(img_links)
-            
-            # print(list(img_links)[0])
-            #print(f"found {searchlinks} links in \"{search_term}\", {totallinks} total so far")
-        
-        print(f"\nfound {len(img_links)} total links in {len(self.search_terms)} search terms\n")
 
-        
-        save_num, padding = ImageScraper.create_save_location(holding_dir = self.save_location, num_new_files=len(img_links))
-        
-        BaseManager.register('Counter', Counter)
-        manager = BaseManager()
-        manager.start()
-    
-        counter = manager.Counter(save_num)
-        
-        func = partial(ImageScraper.url_download_and_save, counter, padding, self.save_location)
+                    # Streamed from the journal a batch at a time
+                    num_saved = downloader.run(journal.pending_links(), on_result=on_result)
 
-        if self.threads_download_num == 1:
-            results = []
-            for img_link in tqdm(img_links):
-                results.append(func(img_link))
+                print(f"\nsaved {num_saved} out of {num_pending}\n")
 
-        else:
-            with ProcessPool(max_workers=self.threads_download_num) as pool:
-                results = pool.map(func, img_links, timeout=250)
+            journal.finish_run()
+        finally:
+            ImageScraper._close_resources(journal, index, numbering, search_cache, postprocessor)
+            metrics.close()
 
-                new_results = []
 
-                with tqdm(total=len(img_links)) as progress:
-                    for result in results.result():
-                        new_results.append(result)
-                        progress.update(1)
-                results = new_results
+    @classmethod
+    def fetch_pages(cls, page_urls: Iterable[str], parse: Callable[[str], List[str]]) -> List[str]:
+        import requests
+
+        img_links = {}
+
+        with requests.Session() as session:
+            session.headers["User-Agent"] = cls.user_agent
+
+            for (num, page_url) in enumerate(page_urls):
+                with Metrics.task_timer("page_load_seconds"):
+                    response = session.get(page_url, timeout=cls.http_timeout_s)
+
+                # Paging past the last result is an error on some engines, the pages before it still count
+                if response.status_code != 200 and num > 0:
+                    break
 
-        num_saved = 0
+                response.raise_for_status()
 
-        num_saved = len([True for result in results if result == True])
+                with Metrics.task_timer("link_extraction_seconds"):
+                    page_links = parse(response.text)
 
-        print(f"\nsaved {num_saved} out of {len(results)}\n")
+                Metrics.task_record("pages_total", 1)
 
+                num_links = len(img_links)
+                img_links.update(dict.fromkeys(page_links))
+
+                # Engines repeat their last page rather than erroring
+                if len(img_links) == num_links:
+                    break
+
+        return list(img_links)
+
+    @staticmethod
+    def fetch_image_links(searchterm: str, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
+        raise NotImplementedError
 
     @staticmethod
     def get_image_links(searchterm: str, driver: RemoteWebDriver, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
@@ -0,0 +1,115 @@
+from enum import IntEnum
+
+import io
+
+from PIL import Image
+
+# Just for typing
+from typing import Tuple
+from os import PathLike
+
+
+class ImageValidator:
+    class Verdict(IntEnum):
+        Pending = 0
+        Accepted = 1
+        Rejected = 2
+
+    # Pillow formats whose names don't match the usual file extension
+    format_extensions = {"JPEG": ".jpg", "TIFF": ".tif", "JPEG2000": ".jp2"}
+
+    min_resolution: Tuple[int, int]
+    max_resolution: Tuple[int, int] | None
+    header_bytes_limit: int
+
+    resize_to: Tuple[int, int] | None
+    save_format: str | None
+    save_mode: str | None
+
+    def __init__(self, min_resolution: Tuple[int, int] = (0, 0), max_resolution: Tuple[int, int] | None = None,
+                        header_bytes_limit: int = 256*1024, resize_to: Tuple[int, int] | None = None, save_format: str | None = None,
+                        save_mode: str | None = None) -> None:
+
+        if header_bytes_limit < 1:
+            raise ValueError("header_bytes_limit must be >= 1")
+
+        self.min_resolution = min_resolution
+        self.max_resolution = max_resolution
+        self.header_bytes_limit = header_bytes_limit
+
+        self.resize_to = resize_to
+        self.save_format = None if save_format is None else ImageValidator.normalize_format(save_format)
+        # e.g. RGB, so palette, CMYK and alpha images don't each need handling downstream
+        self.save_mode = save_mode
+
+    @staticmethod
+    def normalize_format(image_format: str) -> str:
+        # Pillow only knows upper case names, extensions like jpg or tif map to them through the plugin registry
+        Image.init()
+        image_format = image_format.upper()
+        image_format = Image.registered_extensions().get("." + image_format.lower(), image_format)
+
+        if image_format not in Image.SAVE:
+            raise ValueError(f"Pillow cannot save images as {image_format}")
+
+        return image_format
+
+    @staticmethod
+    def format_extension(image_format: str) -> str:
+        return ImageValidator.format_extensions.get(image_format, "." + image_format.lower())
+
+    def check_resolution(self, size: Tuple[int, int]) -> bool:
+        if size[0] < self.min_resolution[0] or size[1] < self.min_resolution[1]:
+            return False
+
+        if self.max_resolution is not None and (size[0] > self.max_resolution[0] or size[1] > self.max_resolution[1]):
+            return False
+
+        return True
+
+    def check_header(self, header: bytes, complete: bool = False) -> Tuple[Verdict, str | None]:
+        # Image.open only parses the header, the pixel data is never decoded here
+        try:
+            with Image.open(io.BytesIO(header)) as image:
+                size = image.size
+                image_format = image.format
+        except Image.DecompressionBombError:
+            return ImageValidator.Verdict.Rejected, None
+        except Exception:
+            # Truncated headers fail in plugin specific ways, wait for more bytes unless there won't be any
+            if complete or len(header) >= self.header_bytes_limit:
+                return ImageValidator.Verdict.Rejected, None
+
+            return ImageValidator.Verdict.Pending, None
+
+        if image_format is None or not self.check_resolution(size):
+            return ImageValidator.Verdict.Rejected, image_format
+
+        return ImageValidator.Verdict.Accepted, image_format
+
+    @property
+    def transforms(self) -> bool:
+        return self.resize_to is not None or self.save_format is not None or self.save_mode is not None
+
+    def transform(self, path: str | PathLike, image_format: str) -> Tuple[bool, str]:
+        # Returns whether the image decoded and the format it is saved in
+        save_format = self.save_format if self.save_format is not None else image_format
+
+        try:
+            with Image.open(path) as image:
+                image.load()
+
+                if self.resize_to is not None:
+                    image.thumbnail(self.resize_to, Image.LANCZOS)
+
+                if self.save_mode is not None and image.mode != self.save_mode:
+                    image = image.convert(self.save_mode)
+
+                if save_format == "JPEG" and image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+
+                image.save(path, format=save_format)
+        except Exception:
+            return False, image_format
+
+        return True, save_format
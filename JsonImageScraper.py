@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import datetime, json
+from urllib.parse import urlencode
+
+# Just for typing
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+from ImageScraper import ImageScraper
+
+class JsonImageScraper(ImageScraper):
+    # Any search API that answers with a page of results as JSON, no browser involved.
+    # The defaults fit Openverse, point the class attributes at another API to use that instead,
+    # or subclass it with its own engine_name to have both
+    engine_name = "json"
+    needs_driver = False
+    supports_http = True
+
+    # Set before_param and after_param as well when the API can filter by date
+    supports_date_ranges = False
+
+    search_base_url = "https://api.openverse.org/v1/images/"
+    query_param = "q"
+    page_param = "page"
+    first_page = 1
+    before_param: str | None = None
+    after_param: str | None = None
+    extra_params: Dict[str, str] = {"page_size": "20"}
+
+    results_key = "results"
+    url_key = "url"
+
+    # Upper bound for pages_num = -1, APIs page further than is useful
+    max_pages = 50
+
+    @classmethod
+    def search_params(cls, searchterm: str, page: int, before: datetime.date | None = None, after: datetime.date | None = None) -> Dict[str, str]:
+        params = {**cls.extra_params, cls.query_param: searchterm, cls.page_param: str(page)}
+
+        if before is not None and cls.before_param is not None:
+            params[cls.before_param] = before.isoformat()
+
+        if after is not None and cls.after_param is not None:
+            params[cls.after_param] = after.isoformat()
+
+        return params
+
+    @classmethod
+    def parse_image_links(cls, payload: Any) -> List[str]:
+        results = payload.get(cls.results_key, []) if isinstance(payload, dict) else payload
+
+        img_links = []
+
+        for result in results if isinstance(results, list) else []:
+            img_link = result.get(cls.url_key) if isinstance(result, dict) else result
+
+            if isinstance(img_link, str) and img_link.startswith(("http://", "https://")):
+                img_links.append(img_link)
+
+        return img_links
+
+    @classmethod
+    def page_url(cls, searchterm: str, page: int, before: datetime.date | None = None, after: datetime.date | None = None) -> str:
+        return f"{cls.search_base_url}?{urlencode(cls.search_params(searchterm, page, before, after))}"
+
+    @classmethod
+    def fetch_image_links(cls, searchterm: str, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
+        num_pages = cls.max_pages if pages_num == -1 else min(pages_num, cls.max_pages)
+
+        return cls.fetch_pages([cls.page_url(searchterm, page, before, after) for page in range(cls.first_page, cls.first_page + num_pages)],
+                               lambda text: cls.parse_image_links(json.loads(text)))
+
+    @classmethod
+    def get_image_links(cls, searchterm: str, driver: RemoteWebDriver | None = None, before: datetime.date | None = None, after: datetime.date | None = None, pages_num: int = -1) -> List[str]:
+        # Nothing for a browser to do, the Browser backend gets the same HTTP search
+        return cls.fetch_image_links(searchterm, before, after, pages_num)
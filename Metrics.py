@@ -0,0 +1,185 @@
+import bisect, collections, contextlib, json, threading, time
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Just for typing
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+from os import PathLike
+
+
+class Metrics:
+    # Names ending in _total are counters, everything else is a histogram, same as Prometheus naming
+
+    class Histogram:
+        buckets: Sequence[float]
+        counts: List[int]
+        sum: float
+        count: int
+
+        def __init__(self, buckets: Sequence[float]) -> None:
+            self.buckets = buckets
+            self.counts = [0] * (len(buckets) + 1)
+            self.sum = 0
+            self.count = 0
+
+        def observe(self, value: float) -> None:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    second_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+    byte_buckets = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 5e7)
+
+    prefix = "image_scraper_"
+
+    counters: Dict[str, float]
+    histograms: Dict[str, Histogram]
+
+    # Search workers can't reach the parent's Metrics, they record into a per thread buffer instead
+    _task = threading.local()
+    # Bounded for callers that record but never drain
+    task_buffer_size = 10000
+
+    def __init__(self, jsonl_path: str | PathLike | None = None) -> None:
+        self.counters = {}
+        self.histograms = {}
+
+        self._lock = threading.Lock()
+        self._file = open(jsonl_path, 'a', buffering=1) if jsonl_path is not None else None
+        self._server = None
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Metrics.Histogram(Metrics.byte_buckets if name.endswith("_bytes") else Metrics.second_buckets)
+
+            self.histograms[name].observe(value)
+
+    def record(self, name: str, value: float) -> None:
+        if name.endswith("_total"):
+            self.inc(name, value)
+        else:
+            self.observe(name, value)
+
+    def merge(self, records: List[Tuple[str, float]]) -> Dict[str, float]:
+        totals = {}
+
+        for (name, value) in records:
+            self.record(name, value)
+            totals[name] = totals.get(name, 0) + value
+
+        return totals
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def event(self, name: str, **fields: Any) -> None:
+        if self._file is None:
+            return
+
+        line = json.dumps({"ts": time.time(), "event": name, **fields}, default=str)
+
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: {"count": histogram.count, "sum": histogram.sum} for name, histogram in self.histograms.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {Metrics.prefix}{name} counter")
+                lines.append(f"{Metrics.prefix}{name} {value}")
+
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {Metrics.prefix}{name} histogram")
+
+                cumulative = 0
+                for bucket, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{Metrics.prefix}{name}_bucket{{le="{bucket}"}} {cumulative}')
+
+                lines.append(f"{Metrics.prefix}{name}_sum {histogram.sum}")
+                lines.append(f"{Metrics.prefix}{name}_count {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = metrics.to_prometheus().encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+        if self._file is not None:
+            self.event("summary", **self.snapshot())
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def task_record(name: str, value: float) -> None:
+        # Buffered per thread and handed back with the next search task result, see task_drain
+        records = getattr(Metrics._task, "records", None)
+
+        if records is None:
+            records = Metrics._task.records = collections.deque(maxlen=Metrics.task_buffer_size)
+
+        records.append((name, value))
+
+    @staticmethod
+    @contextlib.contextmanager
+    def task_timer(name: str) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            Metrics.task_record(name, time.perf_counter() - start)
+
+    @staticmethod
+    def task_drain() -> List[Tuple[str, float]]:
+        records = getattr(Metrics._task, "records", None)
+
+        if records is None:
+            return []
+
+        drained = list(records)
+        records.clear()
+
+        return drained
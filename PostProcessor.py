@@ -0,0 +1,190 @@
+import concurrent.futures, csv, datetime, os, threading, time
+
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+
+from PIL import Image
+
+# Just for typing
+from typing import Any, Callable, Dict, List, Tuple
+from os import PathLike
+
+
+class PostProcessor:
+    # Decoding and resizing is CPU bound, it runs on a process pool behind the download workers.
+    # Writes resized copies of every saved image and a manifest row for each one
+
+    manifest_formats = ("csv", "parquet")
+    manifest_columns = ("file_name", "url", "searchterm", "engine", "before", "after", "width", "height", "format", "mode", "content_hash")
+    manifest_name = "manifest"
+
+    # Parquet rows are written in row groups of this size, CSV rows as they come
+    row_group_size: int = 10000
+
+    save_location: str | PathLike
+    sizes: List[Tuple[int, int]]
+    manifest_format: str | None
+
+    executor: Executor
+
+    def __init__(self, save_location: str | PathLike, sizes: List[Tuple[int, int]] | None = None, manifest_format: str | None = None,
+                        executor: Executor | None = None, workers: int | None = None,
+                        source: Callable[[str], Tuple[str, str, str, str] | None] | None = None) -> None:
+
+        if manifest_format is not None and manifest_format not in PostProcessor.manifest_formats:
+            raise ValueError("manifest_format must be None or one of " + ", ".join(PostProcessor.manifest_formats))
+
+        self.save_location = save_location
+        self.sizes = sizes if sizes is not None else []
+        self.manifest_format = manifest_format
+
+        # A batch shares one pool between its categories
+        self._owns_executor = executor is None
+        self.executor = executor if executor is not None else ProcessPoolExecutor(max_workers=workers)
+
+        # Search term, engine and date window that found a URL, from the journal
+        self.source = source
+
+        self._futures: Dict[Future, None] = {}
+        self._rows: List[Tuple] = []
+        self._lock = threading.Lock()
+
+        self._csv_file = None
+        self._csv_writer = None
+        self._parquet_writer = None
+
+        if manifest_format == "parquet":
+            # Only needed for Parquet manifests
+            try:
+                import pyarrow
+            except ImportError:
+                raise ImportError("Parquet manifests need pyarrow, pip install pyarrow or use manifest_format=\"csv\"")
+
+    @staticmethod
+    def size_dir_name(size: Tuple[int, int]) -> str:
+        return f"{size[0]}x{size[1]}"
+
+    @staticmethod
+    def process_image(path: str | PathLike, sizes: List[Tuple[int, int]], save_location: str | PathLike) -> Tuple[int, int, str, str] | None:
+        # Runs in the pool, returns what the manifest needs about the image
+        try:
+            with Image.open(path) as image:
+                for size in sizes:
+                    variant = image.copy()
+                    variant.thumbnail(size, Image.LANCZOS)
+
+                    if image.format == "JPEG" and variant.mode not in ("RGB", "L"):
+                        variant = variant.convert("RGB")
+
+                    size_dir = os.path.join(save_location, PostProcessor.size_dir_name(size))
+                    os.makedirs(size_dir, exist_ok=True)
+
+                    variant.save(os.path.join(size_dir, os.path.basename(path)), format=image.format)
+
+                return (image.width, image.height, image.format, image.mode)
+        except Exception:
+            return None
+
+    def add(self, path: str | PathLike, url: str | None, content_hash: str) -> None:
+        if len(self.sizes) == 0 and self.manifest_format is None:
+            return
+
+        source = self.source(url) if self.source is not None and url is not None else None
+        (searchterm, engine, before, after) = source if source is not None else (None, None, None, None)
+
+        future = self.executor.submit(PostProcessor.process_image, path, self.sizes, self.save_location)
+
+        def on_done(future: Future) -> None:
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+
+            (width, height, image_format, mode) = result if result is not None else (None, None, None, None)
+
+            with self._lock:
+                self._rows.append((os.path.basename(path), url, searchterm, engine, before, after, width, height, image_format, mode, content_hash))
+                self._futures.pop(future, None)
+
+        with self._lock:
+            self._futures[future] = None
+
+        future.add_done_callback(on_done)
+
+        self._write_rows()
+
+    def _write_rows(self, flush: bool = False) -> None:
+        if self.manifest_format is None:
+            with self._lock:
+                self._rows = []
+            return
+
+        with self._lock:
+            if self.manifest_format == "parquet" and len(self._rows) < self.row_group_size and not flush:
+                return
+
+            rows = self._rows
+            self._rows = []
+
+        if len(rows) == 0:
+            return
+
+        if self.manifest_format == "csv":
+            self._write_csv(rows)
+        else:
+            self._write_parquet(rows)
+
+    def _write_csv(self, rows: List[Tuple]) -> None:
+        if self._csv_writer is None:
+            path = os.path.join(self.save_location, PostProcessor.manifest_name + ".csv")
+            new_file = not os.path.exists(path)
+
+            # Appended to by every run into the same save location
+            self._csv_file = open(path, 'a', newline='')
+            self._csv_writer = csv.writer(self._csv_file)
+
+            if new_file:
+                self._csv_writer.writerow(PostProcessor.manifest_columns)
+
+        self._csv_writer.writerows(rows)
+
+    def _write_parquet(self, rows: List[Tuple]) -> None:
+        import pyarrow, pyarrow.parquet
+
+        table = pyarrow.Table.from_pydict({column: [row[num] for row in rows] for (num, column) in enumerate(PostProcessor.manifest_columns)},
+                                          schema=PostProcessor._parquet_schema())
+
+        if self._parquet_writer is None:
+            # Parquet files can't be appended to, every run writes its own
+            name = "{}-{}.parquet".format(PostProcessor.manifest_name, datetime.datetime.now().strftime("%Y%m%dT%H%M%S"))
+            self._parquet_writer = pyarrow.parquet.ParquetWriter(os.path.join(self.save_location, name), table.schema)
+
+        self._parquet_writer.write_table(table)
+
+    @staticmethod
+    def _parquet_schema() -> Any:
+        import pyarrow
+
+        return pyarrow.schema([(column, pyarrow.int64() if column in ("width", "height") else pyarrow.string()) for column in PostProcessor.manifest_columns])
+
+    def close(self) -> None:
+        # Waits for the images still in the pool, and for their rows, which are added just after the result
+        while True:
+            with self._lock:
+                futures = list(self._futures)
+
+            if len(futures) == 0:
+                break
+
+            concurrent.futures.wait(futures)
+            time.sleep(0.01)
+
+        if self._owns_executor:
+            self.executor.shutdown()
+
+        self._write_rows(flush=True)
+
+        if self._csv_file is not None:
+            self._csv_file.close()
+
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
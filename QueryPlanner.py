@@ -0,0 +1,144 @@
+import collections, datetime
+
+# Just for typing
+from typing import Deque, Dict, List, Tuple
+
+
+class QueryPlanner:
+    class TermPlan:
+        searchterm: str
+        engine: str
+        max_tasks: int
+        frontier: datetime.date
+        delta: datetime.timedelta
+        splits: List[Tuple[datetime.date, datetime.date, str, str]]
+        recent: Deque[Tuple[int, int]]
+        num_tasks: int
+        stopped: bool
+
+        def __init__(self, searchterm: str, engine: str, max_tasks: int, date_start: datetime.date, date_delta: datetime.timedelta, yield_window: int) -> None:
+            self.searchterm = searchterm
+            self.engine = engine
+            self.max_tasks = max_tasks
+            self.frontier = date_start
+            self.delta = date_delta
+            self.splits = []
+            self.recent = collections.deque(maxlen=yield_window)
+            self.num_tasks = 0
+            self.stopped = False
+
+    adaptive: bool
+
+    saturation_links: int | None
+    sparse_links: int
+    min_window: datetime.timedelta
+    max_window: datetime.timedelta
+    min_marginal_yield: float
+
+    # One plan per search term and engine, so a term's windows are searched on every engine in parallel
+    plans: Dict[Tuple[str, str], TermPlan]
+
+    def __init__(self, search_terms: List[str], date_start: datetime.date, date_num_ranges: int, date_delta: datetime.timedelta,
+                        adaptive: bool = False, saturation_links: int | None = None, sparse_links: int = 10,
+                        min_window: datetime.timedelta = datetime.timedelta(weeks=1), max_window: datetime.timedelta = datetime.timedelta(weeks=52*2),
+                        min_marginal_yield: float = 0.05, yield_window: int = 3, engines: List[str] | None = None,
+                        undated_engines: List[str] | None = None) -> None:
+
+        if yield_window < 1:
+            raise ValueError("yield_window must be >= 1")
+
+        self.adaptive = adaptive
+
+        self.saturation_links = saturation_links
+        self.sparse_links = sparse_links
+        self.min_window = min_window
+        self.max_window = max(max_window, date_delta)
+        self.min_marginal_yield = min_marginal_yield
+
+        engines = engines if engines is not None else [""]
+        undated_engines = undated_engines if undated_engines is not None else []
+
+        self.plans = {}
+
+        # Adaptive plans spend the same number of searches, just on different windows.
+        # Engines without date filters would return the same results for every window, they get one search
+        for searchterm in search_terms:
+            for engine in engines:
+                max_tasks = min(date_num_ranges, 1) if engine in undated_engines else date_num_ranges
+
+                self.plans[(searchterm, engine)] = QueryPlanner.TermPlan(searchterm, engine, max_tasks, date_start, date_delta, yield_window)
+
+        self._order = collections.deque(self.plans.values())
+
+    @property
+    def max_tasks(self) -> int:
+        return sum([plan.max_tasks for plan in self.plans.values()])
+
+    def _next_task(self, plan: TermPlan) -> Tuple[datetime.date, datetime.date, str, str] | None:
+        if plan.stopped or plan.num_tasks >= plan.max_tasks:
+            return None
+
+        plan.num_tasks += 1
+
+        # Halves of saturated windows go before new ground
+        if len(plan.splits) > 0:
+            return plan.splits.pop(0)
+
+        before = plan.frontier
+        plan.frontier = before - plan.delta
+
+        return (before, plan.frontier, plan.searchterm, plan.engine,)
+
+    def next_tasks(self, max_tasks: int) -> List[Tuple[datetime.date, datetime.date, str, str]]:
+        tasks = []
+
+        # Round robin over the terms so every term reports back early
+        while len(tasks) < max_tasks:
+            issued = False
+
+            for _ in range(len(self._order)):
+                if len(tasks) >= max_tasks:
+                    break
+
+                plan = self._order[0]
+                self._order.rotate(-1)
+
+                task = self._next_task(plan)
+
+                if task is not None:
+                    tasks.append(task)
+                    issued = True
+
+            if not issued:
+                break
+
+        return tasks
+
+    def report(self, task: Tuple[datetime.date, datetime.date, str, str], num_links: int, num_new: int) -> None:
+        if not self.adaptive:
+            return
+
+        (before, after, searchterm, engine) = task
+        plan = self.plans[(searchterm, engine)]
+
+        plan.recent.append((num_links, num_new))
+
+        # Stop once the last few windows mostly returned links we already had
+        if len(plan.recent) == plan.recent.maxlen:
+            if sum([new for (_, new) in plan.recent]) < self.min_marginal_yield * max(sum([links for (links, _) in plan.recent]), 1):
+                plan.stopped = True
+                return
+
+        window = before - after
+
+        if self.saturation_links is not None and num_links >= self.saturation_links:
+            # The window hit the page cap, there is more in it than one query can return
+            if window >= 2 * self.min_window:
+                middle = after + datetime.timedelta(days=window.days // 2)
+
+                plan.splits += [(before, middle, searchterm, engine,), (middle, after, searchterm, engine,)]
+
+            plan.delta = max(datetime.timedelta(days=plan.delta.days // 2), self.min_window)
+        elif num_links <= self.sparse_links:
+            # Few results, cover more time per query from here on
+            plan.delta = min(plan.delta * 2, self.max_window)
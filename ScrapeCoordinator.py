@@ -0,0 +1,344 @@
+import datetime, os, threading, time
+
+from multiprocessing.managers import BaseManager
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm import tqdm
+
+from ImageScraper import ImageScraper
+from ImageDownloader import ImageDownloader
+from FileNumbering import FileNumbering
+from ScrapeJournal import ScrapeJournal
+from QueryPlanner import QueryPlanner
+from SearchCache import SearchCache
+from ImageIndex import ImageIndex
+from Metrics import Metrics
+from ByteScheduler import ByteScheduler
+from PostProcessor import PostProcessor
+
+# Just for typing
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class ScrapeCoordinator:
+    # Hands a scraper's search tasks and download URLs out to ScrapeWorkers on other machines.
+    # The journal, dedup index and numbering only live here, so every image is checked and numbered in one place
+
+    class Manager(BaseManager):
+        pass
+
+    # What workers may call, everything else stays local
+    exposed = ("get_scraper", "perceptual_hashes", "next_search_task", "finish_search_task", "is_search_done",
+               "next_downloads", "store_image", "finish_download", "is_done")
+
+    default_port = 50000
+
+    scraper: ImageScraper
+    address: Tuple[str, int]
+    authkey: bytes
+
+    # Work handed out is given back to other workers if it isn't finished in time, e.g. when a worker dies
+    search_lease_s: float
+    download_lease_s: float
+
+    # Workers poll about this often when there is nothing to hand out, stay up long enough for all of them to see the end
+    shutdown_grace_s: float
+
+    def __init__(self, scraper: ImageScraper, address: Tuple[str, int] = ("0.0.0.0", default_port), authkey: bytes = b"",
+                        search_lease_s: float = 1200, download_lease_s: float = 600, shutdown_grace_s: float = 5) -> None:
+
+        if not isinstance(scraper, ImageScraper):
+            ImageScraper._raise_type_error(scraper, ["ImageScraper"])
+
+        if not isinstance(authkey, bytes) or len(authkey) == 0:
+            raise ValueError("authkey must be non-empty bytes, workers need it to connect")
+
+        if search_lease_s <= 0 or download_lease_s <= 0:
+            raise ValueError("search_lease_s and download_lease_s must be > 0")
+
+        self.scraper = scraper
+        self.address = address
+        self.authkey = authkey
+
+        self.search_lease_s = search_lease_s
+        self.download_lease_s = download_lease_s
+        self.shutdown_grace_s = shutdown_grace_s
+
+        # Workers call in on the manager's connection threads, everything they touch runs on this one thread instead
+        self._owner = ThreadPoolExecutor(max_workers=1)
+
+        self.journal: ScrapeJournal | None = None
+        self.index: ImageIndex | None = None
+        self.numbering: FileNumbering | None = None
+        self.planner: QueryPlanner | None = None
+        self.search_cache: SearchCache | None = None
+        self.metrics: Metrics | None = None
+        self.downloader: ImageDownloader | None = None
+        self.byte_scheduler: ByteScheduler | None = None
+        self.postprocessor: PostProcessor | None = None
+
+        self.search_progress: tqdm | None = None
+        self.download_progress: tqdm | None = None
+
+        self._search_leases: Dict[Tuple[datetime.date, datetime.date, str, str], float] = {}
+        self._search_requeued: List[Tuple[datetime.date, datetime.date, str, str]] = []
+        self._planner_empty = False
+
+        # Pending URLs are read from the journal in order, only handed out and expired ones are held here.
+        # Dicts keep insertion order, so they double as queues that can drop any URL
+        self._download_rowid = 0
+        self._download_requeued: Dict[str, None] = {}
+        self._download_leases: Dict[str, float] = {}
+
+        # Set once an image didn't fit the byte budget, the links not handed out yet are left for the next run
+        self._budget_spent = False
+
+        self.num_links = 0
+        self.num_saved = 0
+
+    def _call(self, function: Callable, *args) -> Any:
+        return self._owner.submit(function, *args).result()
+
+    def _open(self) -> None:
+        self.journal = self.scraper._open_journal()
+        self.index = self.scraper._open_index()
+        self.numbering = FileNumbering(self.scraper.save_location)
+        self.search_cache = self.scraper._open_search_cache()
+        self.metrics = self.scraper._open_metrics()
+
+        # An interrupted run is resumed with its original dates
+        self.planner = self.scraper._create_planner(self.journal.start_run())
+
+        # Workers have done the transforms already, only the size set and manifest are left for here
+        self.postprocessor = self.scraper._open_postprocessor(self.journal)
+
+        # Only used to number and save what the workers send back
+        self.downloader = self.scraper._create_downloader(self.numbering, self.index, self.metrics, self.postprocessor, journal=self.journal)
+        self.downloader.clean_partial()
+
+        # The budget holds for the whole run, over every worker, the bandwidth cap is each worker's own
+        if self.scraper.download_byte_budget is not None or self.scraper.min_free_bytes is not None:
+            self.byte_scheduler = ByteScheduler(max_bytes=self.scraper.download_byte_budget, min_free_bytes=self.scraper.min_free_bytes)
+
+        self.search_progress = tqdm(total=0, desc="search", position=0)
+        self.download_progress = tqdm(total=0, desc="download", position=1)
+
+        self._add_links(self.journal.num_pending_links())
+
+        self.metrics.event("run_start", search_terms=self.scraper.search_terms, save_location=self.scraper.save_location, distributed=True)
+
+    def _close(self) -> None:
+        for progress in [self.search_progress, self.download_progress]:
+            if progress is not None:
+                progress.close()
+
+        for resource in [self.postprocessor, self.journal, self.numbering, self.index, self.search_cache, self.metrics]:
+            if resource is not None:
+                resource.close()
+
+    def _add_links(self, num_links: int) -> None:
+        # New links are in the journal already
+        self.num_links += num_links
+
+        self.download_progress.total += num_links
+        self.download_progress.refresh()
+
+    def _expire_leases(self) -> None:
+        now = time.monotonic()
+
+        for date_set in [date_set for (date_set, deadline) in self._search_leases.items() if deadline < now]:
+            del self._search_leases[date_set]
+            self._search_requeued.append(date_set)
+
+        for url in [url for (url, deadline) in self._download_leases.items() if deadline < now]:
+            del self._download_leases[url]
+            self._download_requeued[url] = None
+
+    def _next_search_task(self) -> Tuple[datetime.date, datetime.date, str, str] | None:
+        self._expire_leases()
+
+        while True:
+            if len(self._search_requeued) > 0:
+                date_set = self._search_requeued.pop(0)
+            else:
+                date_sets = self.planner.next_tasks(1)
+
+                # Windows are only split off tasks in flight, with none left the planner stays empty
+                if len(date_sets) == 0:
+                    self._planner_empty = True
+                    return None
+
+                date_set = date_sets[0]
+
+                new_links = self.scraper._resume_search(self.journal, self.planner, self.metrics, self.search_cache, self.search_progress, date_set)
+
+                if new_links is not None:
+                    self._add_links(len(new_links))
+                    continue
+
+            self._search_leases[date_set] = time.monotonic() + self.search_lease_s
+
+            return date_set
+
+    def _finish_search_task(self, date_set: Tuple[datetime.date, datetime.date, str, str], img_links_elm: List[str], records: List[Tuple[str, float]]) -> None:
+        # A worker that outlived its lease may report after the task went to another worker, the first report counts
+        if date_set in self._search_leases:
+            del self._search_leases[date_set]
+        elif date_set in self._search_requeued:
+            self._search_requeued.remove(date_set)
+        else:
+            return
+
+        self.search_progress.update(1)
+
+        self._add_links(len(self.scraper._record_search(self.journal, self.planner, self.metrics, self.search_cache, date_set, img_links_elm, records)))
+
+        # The report may have split the window, the halves are handed out next
+        self._planner_empty = False
+
+    def _is_search_done(self) -> bool:
+        self._expire_leases()
+
+        return self._planner_empty and len(self._search_leases) == 0 and len(self._search_requeued) == 0
+
+    def _next_downloads(self, max_urls: int) -> List[str]:
+        self._expire_leases()
+
+        # Workers wait while the disk images are saved to is low on space, what they hold already is still taken
+        if self.byte_scheduler is not None and not self.byte_scheduler.has_space(self.scraper.save_location):
+            return []
+
+        if self._budget_spent:
+            return []
+
+        urls = []
+
+        for url in self._download_requeued:
+            if len(urls) >= max_urls:
+                break
+
+            urls.append(url)
+
+        for url in urls:
+            del self._download_requeued[url]
+
+        # Links found while the run goes on get later rowids, so they are picked up here too
+        if len(urls) < max_urls:
+            rows = self.journal.pending_links_after(self._download_rowid, max_urls - len(urls))
+
+            if len(rows) > 0:
+                self._download_rowid = rows[-1][0]
+
+            urls += [url for (_, url) in rows]
+
+        deadline = time.monotonic() + self.download_lease_s
+
+        for url in urls:
+            self._download_leases[url] = deadline
+
+        return urls
+
+    def _store_image(self, data: bytes, extension: str, content_hash: str, perceptual_hash: int | None, url: str | None) -> int:
+        if self.byte_scheduler is not None:
+            if not self.byte_scheduler.reserve(len(data)):
+                self._budget_spent = True
+                return int(ImageDownloader.Result.OverBudget)
+
+            self.byte_scheduler.count(len(data))
+
+        temp_path = self.downloader._next_temp_path()
+
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+
+            return int(self.downloader.commit(temp_path, extension, content_hash, perceptual_hash, url))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _finish_download(self, url: str, result: int) -> None:
+        if url in self._download_leases:
+            del self._download_leases[url]
+        elif url in self._download_requeued:
+            del self._download_requeued[url]
+        else:
+            return
+
+        result = ImageDownloader.Result(result)
+
+        # Saved was recorded when the image was committed
+        if result != ImageDownloader.Result.Saved:
+            self.journal.set_link_status(url, ScrapeJournal.LinkStatus[result.name])
+
+        if result == ImageDownloader.Result.Saved:
+            self.num_saved += 1
+
+        self.metrics.inc(f"downloads_{result.name.lower()}_total")
+        self.metrics.event("download", url=url, result=result.name)
+
+        self.download_progress.update(1)
+
+    def _is_done(self) -> bool:
+        # Past the budget, the links nobody holds stay pending for the next run
+        downloads_left = not self._budget_spent and (len(self._download_requeued) > 0 or len(self.journal.pending_links_after(self._download_rowid, 1)) > 0)
+
+        return self._is_search_done() and len(self._download_leases) == 0 and not downloads_left
+
+    def get_scraper(self) -> ImageScraper:
+        # Workers search and validate with a copy, so they need nothing but the address and authkey
+        return self.scraper
+
+    def perceptual_hashes(self) -> bool:
+        return self.index is not None and self.index.perceptual_distance is not None
+
+    def next_search_task(self) -> Tuple[datetime.date, datetime.date, str, str] | None:
+        return self._call(self._next_search_task)
+
+    def finish_search_task(self, date_set: Tuple[datetime.date, datetime.date, str, str], img_links_elm: List[str], records: List[Tuple[str, float]]) -> None:
+        self._call(self._finish_search_task, date_set, img_links_elm, records)
+
+    def is_search_done(self) -> bool:
+        return self._call(self._is_search_done)
+
+    def next_downloads(self, max_urls: int) -> List[str]:
+        return self._call(self._next_downloads, max_urls)
+
+    def store_image(self, data: bytes, extension: str, content_hash: str, perceptual_hash: int | None = None, url: str | None = None) -> int:
+        return self._call(self._store_image, data, extension, content_hash, perceptual_hash, url)
+
+    def finish_download(self, url: str, result: int) -> None:
+        self._call(self._finish_download, url, result)
+
+    def is_done(self) -> bool:
+        return self._call(self._is_done)
+
+    def run(self) -> None:
+        self._call(self._open)
+
+        ScrapeCoordinator.Manager.register("coordinator", callable=lambda: self, exposed=ScrapeCoordinator.exposed)
+
+        manager = ScrapeCoordinator.Manager(address=self.address, authkey=self.authkey)
+        server = manager.get_server()
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        print(f"coordinating {self.scraper.save_location} on {self.address[0]}:{server.address[1]}")
+
+        try:
+            start = time.perf_counter()
+
+            while not self.is_done():
+                time.sleep(1)
+
+            self._call(self.metrics.record, "run_seconds", time.perf_counter() - start)
+            self._call(self.journal.finish_run)
+
+            time.sleep(self.shutdown_grace_s)
+        finally:
+            server.stop_event.set()
+
+            self._call(self._close)
+            self._owner.shutdown()
+
+        print(f"\nfound {self.num_links} total links in {len(self.scraper.search_terms)} search terms, saved {self.num_saved} out of {self.num_links}\n")
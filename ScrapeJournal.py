@@ -0,0 +1,200 @@
+from enum import IntEnum
+
+import datetime, hashlib, itertools, os, sqlite3, tempfile
+
+# Just for typing
+from typing import Iterable, Iterator, List, Tuple
+from os import PathLike
+
+
+class ScrapeJournal:
+    class LinkStatus(IntEnum):
+        Pending = 0
+        Saved = 1
+        Failed = 2
+        Duplicate = 3
+        Rejected = 4
+        Parked = 5
+        OverBudget = 6
+
+    # Downloaded on every run until they get another status
+    retry_statuses = (LinkStatus.Pending, LinkStatus.Parked, LinkStatus.OverBudget)
+
+    file_name = ".scrape_journal.sqlite"
+
+    # Download statuses are committed in batches, a crash only loses the last few. Saved is committed straight away,
+    # the image is already on disk and would be saved again under a new number
+    commit_every: int = 50
+
+    # Pending links are read this many at a time, never all at once
+    batch_size: int = 1000
+
+    connection: sqlite3.Connection
+
+    def __init__(self, save_location: str | PathLike | None = None) -> None:
+        self._temp_path = None
+
+        # Without a save location the journal only lives for the current run, still on disk so big runs don't have to fit in memory
+        if save_location is None:
+            (fd, path) = tempfile.mkstemp(prefix="scrape_journal_", suffix=".sqlite")
+            os.close(fd)
+            self._temp_path = path
+        else:
+            os.makedirs(save_location, exist_ok=True)
+            path = os.path.join(save_location, ScrapeJournal.file_name)
+
+        self.connection = sqlite3.connect(path)
+        self._uncommitted = 0
+
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        # Search tasks from before engines were recorded only matter to an interrupted run, they are searched again
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(search_tasks)")]
+
+        if len(columns) > 0 and "engine" not in columns:
+            self.connection.execute("DROP TABLE search_tasks")
+
+        # Links used to be keyed by the full URL, which stored every URL twice
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(links)")]
+
+        if len(columns) > 0 and "fingerprint" not in columns:
+            self.connection.create_function("fingerprint", 1, ScrapeJournal.fingerprint, deterministic=True)
+            self.connection.executescript("""
+                ALTER TABLE links RENAME TO links_by_url;
+                DROP INDEX IF EXISTS links_status;
+                CREATE TABLE links (fingerprint INTEGER NOT NULL UNIQUE, url TEXT NOT NULL, status INTEGER NOT NULL,
+                                    searchterm TEXT, engine TEXT, before TEXT, after TEXT);
+                INSERT OR IGNORE INTO links (fingerprint, url, status) SELECT fingerprint(url), url, status FROM links_by_url ORDER BY rowid;
+                DROP TABLE links_by_url;
+            """)
+
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS search_tasks (
+                searchterm TEXT NOT NULL, before TEXT NOT NULL, after TEXT NOT NULL, engine TEXT NOT NULL, num_links INTEGER NOT NULL,
+                num_new INTEGER NOT NULL, PRIMARY KEY (searchterm, before, after, engine)
+            );
+            CREATE TABLE IF NOT EXISTS links (
+                fingerprint INTEGER NOT NULL UNIQUE, url TEXT NOT NULL, status INTEGER NOT NULL,
+                searchterm TEXT, engine TEXT, before TEXT, after TEXT
+            );
+            CREATE INDEX IF NOT EXISTS links_status ON links (status);
+        """)
+
+        # The search that first found each link, for the manifest
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(links)")]
+
+        for column in ["searchterm", "engine", "before", "after"]:
+            if column not in columns:
+                self.connection.execute(f"ALTER TABLE links ADD COLUMN {column} TEXT")
+
+        self.connection.commit()
+
+    @staticmethod
+    def fingerprint(url: str) -> int:
+        # 64 bits, signed to fit an SQLite integer, collisions are unlikely below billions of links
+        return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "big", signed=True)
+
+    def start_run(self) -> datetime.date:
+        # An unfinished run keeps its date so the resumed date windows line up with the journal
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'run_date'").fetchone()
+
+        if row is not None:
+            return datetime.date.fromisoformat(row[0])
+
+        run_date = datetime.date.today()
+
+        self.connection.execute("INSERT INTO meta (key, value) VALUES ('run_date', ?)", (run_date.isoformat(),))
+        self.connection.commit()
+
+        return run_date
+
+    def finish_run(self) -> None:
+        self.connection.execute("DELETE FROM meta WHERE key = 'run_date'")
+        self.connection.execute("DELETE FROM search_tasks")
+        self.connection.commit()
+        self._uncommitted = 0
+
+    def is_search_done(self, searchterm: str, before: datetime.date, after: datetime.date, engine: str = "") -> bool:
+        return self.search_result(searchterm, before, after, engine) is not None
+
+    def search_result(self, searchterm: str, before: datetime.date, after: datetime.date, engine: str = "") -> Tuple[int, int] | None:
+        # Number of links a finished search found and how many of them were new
+        row = self.connection.execute("SELECT num_links, num_new FROM search_tasks WHERE searchterm = ? AND before = ? AND after = ? AND engine = ?",
+                                      (searchterm, before.isoformat(), after.isoformat(), engine)).fetchone()
+
+        return None if row is None else (row[0], row[1])
+
+    def add_search_results(self, searchterm: str, before: datetime.date, after: datetime.date, links: Iterable[str], engine: str = "") -> List[str]:
+        links = list(links)
+        new_links = []
+
+        for link in links:
+            cursor = self.connection.execute("INSERT OR IGNORE INTO links (fingerprint, url, status, searchterm, engine, before, after) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                             (ScrapeJournal.fingerprint(link), link, ScrapeJournal.LinkStatus.Pending, searchterm, engine, before.isoformat(), after.isoformat()))
+
+            if cursor.rowcount > 0:
+                new_links.append(link)
+
+        # Failed searches come back empty, leave them to be retried on resume
+        if len(links) > 0:
+            self.connection.execute("INSERT OR REPLACE INTO search_tasks (searchterm, before, after, engine, num_links, num_new) VALUES (?, ?, ?, ?, ?, ?)",
+                                    (searchterm, before.isoformat(), after.isoformat(), engine, len(links), len(new_links)))
+
+        self.connection.commit()
+        self._uncommitted = 0
+
+        return new_links
+
+    def pending_links_after(self, rowid: int, limit: int, max_rowid: int = 2**63 - 1) -> List[Tuple[int, str]]:
+        # Links from parked hosts and ones past the last run's byte budget get another chance every run
+        return self.connection.execute("SELECT rowid, url FROM links WHERE status IN (?, ?, ?) AND rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?",
+                                       (*ScrapeJournal.retry_statuses, rowid, max_rowid, limit)).fetchall()
+
+    def num_pending_links(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM links WHERE status IN (?, ?, ?)", ScrapeJournal.retry_statuses).fetchone()[0]
+
+    def pending_link_batches(self) -> Iterator[List[str]]:
+        # Only the links pending right now, ones added while the batches are read are handed out by add_search_results
+        last_rowid = self.connection.execute("SELECT COALESCE(MAX(rowid), 0) FROM links").fetchone()[0]
+
+        def batches(rowid: int) -> Iterator[List[str]]:
+            while True:
+                rows = self.pending_links_after(rowid, self.batch_size, last_rowid)
+
+                if len(rows) == 0:
+                    return
+
+                rowid = rows[-1][0]
+
+                yield [url for (_, url) in rows]
+
+        return batches(0)
+
+    def pending_links(self) -> Iterator[str]:
+        return itertools.chain.from_iterable(self.pending_link_batches())
+
+    def link_source(self, url: str) -> Tuple[str, str, str, str] | None:
+        # Search term, engine and date window of the search that first found the link
+        row = self.connection.execute("SELECT searchterm, engine, before, after FROM links WHERE fingerprint = ?", (ScrapeJournal.fingerprint(url),)).fetchone()
+
+        return None if row is None or row[0] is None else tuple(row)
+
+    def set_link_status(self, url: str, status: LinkStatus) -> None:
+        self.connection.execute("UPDATE links SET status = ? WHERE fingerprint = ?", (status, ScrapeJournal.fingerprint(url)))
+
+        self._uncommitted += 1
+
+        if status == ScrapeJournal.LinkStatus.Saved or self._uncommitted >= self.commit_every:
+            self.connection.commit()
+            self._uncommitted = 0
+
+    def close(self) -> None:
+        self.connection.commit()
+        self.connection.close()
+
+        if self._temp_path is not None:
+            for path in [self._temp_path, self._temp_path + "-wal", self._temp_path + "-shm"]:
+                if os.path.exists(path):
+                    os.remove(path)
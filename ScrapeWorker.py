@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio, shutil, tempfile
+
+from multiprocessing.managers import BaseManager
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from ImageScraper import ImageScraper
+from ImageDownloader import ImageDownloader
+from HostScheduler import HostScheduler
+from ByteScheduler import ByteScheduler
+from Metrics import Metrics
+
+# Just for typing
+from typing import TYPE_CHECKING, Any, Callable, Tuple
+from os import PathLike
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+
+class ScrapeWorker:
+    # Runs searches and downloads for a ScrapeCoordinator, start as many as the machines can take.
+    # Images are only kept until the coordinator has them
+
+    class Manager(BaseManager):
+        pass
+
+    class Downloader(ImageDownloader):
+        # Validates and hashes here, the coordinator does the dedup check and numbering
+        def __init__(self, coordinator: Any, perceptual_hashes: bool, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+
+            self.coordinator = coordinator
+            self.perceptual_hashes = perceptual_hashes
+
+        @property
+        def _perceptual_hashes(self) -> bool:
+            return self.perceptual_hashes
+
+        async def _store(self, temp_path: str | PathLike, extension: str, content_hash: str, perceptual_hash: int | None, url: str | None = None) -> ImageDownloader.Result:
+            with open(temp_path, 'rb') as file:
+                data = file.read()
+
+            result = await asyncio.get_running_loop().run_in_executor(None, self.coordinator.store_image, data, extension, content_hash, perceptual_hash, url)
+
+            return ImageDownloader.Result(result)
+
+    address: Tuple[str, int]
+    authkey: bytes
+
+    # None takes the numbers from the coordinator's scraper
+    threads_search_num: int | None
+    threads_download_num: int | None
+
+    poll_interval_s: float
+    metrics_path: str | PathLike | None
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, threads_search_num: int | None = None, threads_download_num: int | None = None,
+                        poll_interval_s: float = 1, metrics_path: str | PathLike | None = None) -> None:
+
+        if not isinstance(authkey, bytes) or len(authkey) == 0:
+            raise ValueError("authkey must be non-empty bytes")
+
+        if (threads_search_num is not None and threads_search_num < 0) or (threads_download_num is not None and threads_download_num < 1):
+            raise ValueError("threads_search_num must be >= 0 and threads_download_num >= 1")
+
+        self.address = address
+        self.authkey = authkey
+        self.threads_search_num = threads_search_num
+        self.threads_download_num = threads_download_num
+        self.poll_interval_s = poll_interval_s
+        self.metrics_path = metrics_path
+
+    def _connect(self) -> Any:
+        ScrapeWorker.Manager.register("coordinator")
+
+        manager = ScrapeWorker.Manager(address=self.address, authkey=self.authkey)
+        manager.connect()
+
+        return manager.coordinator()
+
+    @staticmethod
+    async def _call(function: Callable, *args) -> Any:
+        # Proxy calls block on the network, each executor thread gets its own connection
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def _search_loop(self, coordinator: Any, spec: ImageScraper.SearchSpec, search_pool: ImageScraper.SearchPool) -> int:
+        num_searches = 0
+
+        while True:
+            date_set = await ScrapeWorker._call(coordinator.next_search_task)
+
+            if date_set is None:
+                # Other workers may still split their windows or die and have their tasks handed out again
+                if await ScrapeWorker._call(coordinator.is_search_done):
+                    return num_searches
+
+                await asyncio.sleep(self.poll_interval_s)
+                continue
+
+            img_links_elm, records = await ImageScraper._search_outcome(date_set, asyncio.wrap_future(search_pool.submit(spec.search_task, date_set)))
+
+            await ScrapeWorker._call(coordinator.finish_search_task, date_set, img_links_elm, records)
+
+            num_searches += 1
+
+    async def _feed(self, coordinator: Any, downloader: Downloader, queue: asyncio.Queue, num_workers: int) -> None:
+        while True:
+            urls = await ScrapeWorker._call(coordinator.next_downloads, max(queue.maxsize - queue.qsize(), 1))
+
+            if len(urls) == 0:
+                if await ScrapeWorker._call(coordinator.is_done):
+                    break
+
+                await asyncio.sleep(self.poll_interval_s)
+                continue
+
+            for url in urls:
+                await queue.put(url)
+
+        await downloader.join_parked(queue)
+
+        for _ in range(num_workers):
+            await queue.put(None)
+
+    async def _consume(self, coordinator: Any, downloader: Downloader, session: aiohttp.ClientSession, queue: asyncio.Queue) -> int:
+        num_saved = 0
+
+        while True:
+            url = await queue.get()
+
+            # None is the shutdown sentinel, one is sent per worker
+            if url is None:
+                return num_saved
+
+            try:
+                result = await downloader.download(session, url)
+
+                # The lease is held while the URL waits out its host's park
+                if result == ImageDownloader.Result.Parked and downloader.requeue_parked(queue, url):
+                    continue
+            finally:
+                queue.task_done()
+
+            if result == ImageDownloader.Result.Saved:
+                num_saved += 1
+
+            await ScrapeWorker._call(coordinator.finish_download, url, int(result))
+
+    async def _run(self, coordinator: Any, scraper: ImageScraper, downloader: Downloader, metrics: Metrics, driver: RemoteWebDriver | None = None) -> Tuple[int, int]:
+        threads_search_num = scraper.threads_search_num if self.threads_search_num is None else self.threads_search_num
+        threads_download_num = scraper.threads_download_num if self.threads_download_num is None else self.threads_download_num
+
+        # Enough threads that waiting on the coordinator never holds up a search or a download
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=threads_search_num + threads_download_num + 2))
+
+        search_pool = scraper._open_search_pool(threads_search_num, driver, metrics) if threads_search_num > 0 else None
+        spec = scraper._create_search_spec()
+
+        try:
+            queue = downloader.create_queue()
+
+            async with downloader.create_session() as session:
+                searches = [self._search_loop(coordinator, spec, search_pool) for _ in range(threads_search_num)]
+                consumers = [self._consume(coordinator, downloader, session, queue) for _ in range(threads_download_num)]
+
+                results = await asyncio.gather(self._feed(coordinator, downloader, queue, threads_download_num), *searches, *consumers)
+
+            return sum(results[1:1 + threads_search_num]), sum(results[1 + threads_search_num:])
+        finally:
+            if search_pool is not None:
+                search_pool.close()
+
+    def run(self, driver: RemoteWebDriver | None = None) -> None:
+        coordinator = self._connect()
+
+        scraper = coordinator.get_scraper()
+        metrics = Metrics(self.metrics_path)
+
+        # Only holds images until they are sent, the numbering in it is never used
+        work_dir = tempfile.mkdtemp(prefix="scrape_worker_")
+
+        # The bandwidth cap holds per worker. The byte budget and free space are up to the coordinator that saves the images
+        byte_scheduler = None
+
+        if scraper.download_byte_rate is not None:
+            byte_scheduler = ByteScheduler(scraper.download_byte_rate)
+
+        downloader = ScrapeWorker.Downloader(coordinator, coordinator.perceptual_hashes(), work_dir,
+                                             max_connections=self.threads_download_num or scraper.threads_download_num,
+                                             max_connections_per_host=scraper.threads_download_host_num, validator=scraper._create_validator(),
+                                             metrics=metrics, max_retries=scraper.download_retries, scheduler=HostScheduler(scraper.download_host_rate),
+                                             executor=scraper._create_postprocess_executor(), byte_scheduler=byte_scheduler,
+                                             max_file_bytes=scraper.max_file_bytes, head_requests=scraper.head_requests)
+        downloader.clean_partial()
+
+        try:
+            num_searches, num_saved = asyncio.run(self._run(coordinator, scraper, downloader, metrics, driver))
+        finally:
+            downloader.numbering.close()
+
+            if downloader.executor is not None:
+                downloader.executor.shutdown()
+            metrics.close()
+
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        print(f"\nran {num_searches} searches and saved {num_saved} images for {self.address[0]}:{self.address[1]}\n")
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import time
+
+# Just for typing
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+
+class ScrollPaginator:
+    # Scrolls to the bottom, optionally clicks the "more results" button and reports the page state,
+    # all in one round trip instead of a key press plus a find_elements call per element
+    state_script = """
+        const [resultSelector, endXPath, endText, buttonXPath] = arguments;
+        const find = (xpath) => document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+
+        window.scrollTo(0, document.body.scrollHeight);
+
+        const end = endXPath === null ? null : find(endXPath);
+        const button = find(buttonXPath);
+        const clicked = button !== null && button.offsetParent !== null;
+
+        if (clicked) {
+            button.click();
+        }
+
+        return {
+            results: document.querySelectorAll(resultSelector).length,
+            height: document.body.scrollHeight,
+            end: end !== null && end.innerText.trim() === endText,
+            clicked: clicked,
+        };
+    """
+
+    result_selector: str
+    end_xpath: str | None
+    end_text: str
+    button_xpath: str
+    results_per_page: int | None
+
+    min_interval_s: float
+    max_interval_s: float
+    backoff: float
+    idle_timeout_s: float
+
+    page_timings: List[float]
+
+    def __init__(self, result_selector: str, end_xpath: str | None, end_text: str, button_xpath: str, min_interval_s: float = 0.05,
+                        max_interval_s: float = 1.0, backoff: float = 1.5, idle_timeout_s: float = 10, results_per_page: int | None = None) -> None:
+
+        if min_interval_s <= 0 or max_interval_s < min_interval_s:
+            raise ValueError("intervals must satisfy 0 < min_interval_s <= max_interval_s")
+
+        if backoff < 1:
+            raise ValueError("backoff must be >= 1")
+
+        self.result_selector = result_selector
+        self.end_xpath = end_xpath
+        self.end_text = end_text
+        self.button_xpath = button_xpath
+        # For infinite scroll, where pages are counted by results instead of button clicks
+        self.results_per_page = results_per_page
+
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.backoff = backoff
+        self.idle_timeout_s = idle_timeout_s
+
+        self.page_timings = []
+
+    def _state(self, driver: RemoteWebDriver) -> dict:
+        return driver.execute_script(ScrollPaginator.state_script, self.result_selector, self.end_xpath, self.end_text, self.button_xpath)
+
+    def run(self, driver: RemoteWebDriver, pages_num: int = -1) -> int:
+        # Returns the number of result pages loaded, page_timings holds how long each one took
+        self.page_timings = []
+
+        num_pages = 0
+
+        interval = self.min_interval_s
+
+        page_start = time.monotonic()
+        last_progress = page_start
+
+        results, height = -1, -1
+        # A click only makes a page once what it loads shows up, a button that loads nothing is no progress
+        clicked = False
+
+        while num_pages < pages_num or pages_num == -1:
+            state = self._state(driver)
+
+            now = time.monotonic()
+
+            if state["end"]:
+                break
+
+            if state["results"] > results or state["height"] > height:
+                results, height = state["results"], state["height"]
+
+                if clicked or (self.results_per_page is not None and results >= (num_pages + 1) * self.results_per_page):
+                    num_pages += 1
+                    clicked = False
+
+                    self.page_timings.append(now - page_start)
+                    page_start = now
+
+                last_progress = now
+                interval = self.min_interval_s
+            else:
+                # Nothing new since the last poll, results stay as they are rather than reloading the page
+                if now - last_progress > self.idle_timeout_s:
+                    break
+
+                interval = min(interval * self.backoff, self.max_interval_s)
+
+            clicked = clicked or state["clicked"]
+
+            time.sleep(interval)
+
+        # Whatever loaded after the last click
+        self.page_timings.append(time.monotonic() - page_start)
+
+        return num_pages
@@ -0,0 +1,139 @@
+import datetime, json, os, sqlite3, time
+
+# Just for typing
+from typing import List
+from os import PathLike
+
+
+class SearchCache:
+    # Link lists of finished searches, keyed by engine, term, date window and page count
+    file_name = ".search_cache.sqlite"
+
+    # Windows ending this close to today still gain results, older ones barely change
+    recent_days: int
+    recent_ttl: datetime.timedelta
+    historical_ttl: datetime.timedelta
+
+    max_bytes: int
+    refresh: bool
+
+    connection: sqlite3.Connection
+
+    def __init__(self, save_location: str | PathLike | None = None, recent_days: int = 30, recent_ttl: datetime.timedelta = datetime.timedelta(days=1),
+                        historical_ttl: datetime.timedelta = datetime.timedelta(days=90), max_bytes: int = 64*1024*1024, refresh: bool = False) -> None:
+
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be >= 1")
+
+        self.recent_days = recent_days
+        self.recent_ttl = recent_ttl
+        self.historical_ttl = historical_ttl
+        self.max_bytes = max_bytes
+        # Looks up nothing but still stores, so a refreshed run leaves a fresh cache behind
+        self.refresh = refresh
+
+        if save_location is None:
+            path = ":memory:"
+        else:
+            os.makedirs(save_location, exist_ok=True)
+            path = os.path.join(save_location, SearchCache.file_name)
+
+        self.connection = sqlite3.connect(path)
+
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                engine TEXT NOT NULL, searchterm TEXT NOT NULL, before TEXT NOT NULL, after TEXT NOT NULL, pages_num INTEGER NOT NULL,
+                links TEXT NOT NULL, size INTEGER NOT NULL, expires REAL NOT NULL, last_used REAL NOT NULL,
+                PRIMARY KEY (engine, searchterm, before, after, pages_num)
+            );
+            CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+        """)
+        self.connection.commit()
+
+        self._size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    @staticmethod
+    def _key(engine: str, searchterm: str, before: datetime.date | None, after: datetime.date | None, pages_num: int) -> tuple:
+        # Engines without date filters are cached once per term
+        return (engine, searchterm, before.isoformat() if before is not None else "", after.isoformat() if after is not None else "", pages_num)
+
+    def ttl(self, before: datetime.date | None) -> datetime.timedelta:
+        if before is None or before >= datetime.date.today() - datetime.timedelta(days=self.recent_days):
+            return self.recent_ttl
+
+        return self.historical_ttl
+
+    def get(self, engine: str, searchterm: str, before: datetime.date | None, after: datetime.date | None, pages_num: int) -> List[str] | None:
+        if self.refresh:
+            return None
+
+        key = SearchCache._key(engine, searchterm, before, after, pages_num)
+
+        row = self.connection.execute("SELECT links, size, expires FROM results WHERE engine = ? AND searchterm = ? AND before = ? AND after = ? AND pages_num = ?",
+                                      key).fetchone()
+
+        if row is None:
+            return None
+
+        (links, size, expires) = row
+
+        if expires < time.time():
+            self.connection.execute("DELETE FROM results WHERE engine = ? AND searchterm = ? AND before = ? AND after = ? AND pages_num = ?", key)
+            self.connection.commit()
+            self._size -= size
+            return None
+
+        self.connection.execute("UPDATE results SET last_used = ? WHERE engine = ? AND searchterm = ? AND before = ? AND after = ? AND pages_num = ?",
+                                (time.time(),) + key)
+        self.connection.commit()
+
+        return json.loads(links)
+
+    def put(self, engine: str, searchterm: str, before: datetime.date | None, after: datetime.date | None, pages_num: int, links: List[str]) -> None:
+        key = SearchCache._key(engine, searchterm, before, after, pages_num)
+
+        links = json.dumps(links)
+        now = time.time()
+
+        row = self.connection.execute("SELECT size FROM results WHERE engine = ? AND searchterm = ? AND before = ? AND after = ? AND pages_num = ?",
+                                      key).fetchone()
+
+        if row is not None:
+            self._size -= row[0]
+
+        self.connection.execute("INSERT OR REPLACE INTO results (engine, searchterm, before, after, pages_num, links, size, expires, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                key + (links, len(links), now + self.ttl(before).total_seconds(), now))
+        self._size += len(links)
+
+        self._evict()
+
+        self.connection.commit()
+
+    def _evict(self) -> None:
+        # Least recently used first, until the cache is back under its size bound
+        while self._size > self.max_bytes:
+            rows = self.connection.execute("SELECT rowid, size FROM results ORDER BY last_used LIMIT 100").fetchall()
+
+            if len(rows) == 0:
+                self._size = 0
+                return
+
+            for (rowid, size) in rows:
+                if self._size <= self.max_bytes:
+                    return
+
+                self.connection.execute("DELETE FROM results WHERE rowid = ?", (rowid,))
+                self._size -= size
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM results")
+        self.connection.commit()
+        self._size = 0
+
+    def close(self) -> None:
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmarks against FakeImageServer, a local stand-in for Google Images and image hosts.
+
+    python benchmark.py                                   # parse and download phases, no browser needed
+    python benchmark.py --phases search run               # needs Firefox or Chrome
+    python benchmark.py --phases search run --engines json    # no browser needed
+    python benchmark.py --phases search run --search-backend Http --engines google bing
+    python benchmark.py --threads-download 4 8 16 32      # sweep to tune threads_download_num
+    python benchmark.py --phases startup --start-method spawn --search-backend Http   # imports and time to the first search result
+
+Each phase runs in its own process so peak RSS is per phase.
+"""
+#Import libraries
+import argparse, asyncio, json, multiprocessing, os, pickle, resource, shutil, sys, tempfile, time, urllib.request
+
+from FakeImageServer import FakeImageServer
+
+# Just for typing
+from typing import Any, Callable, Dict, List
+
+
+def _peak_rss_mb() -> float:
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024*1024 if sys.platform == "darwin" else 1024)
+
+
+def _dir_bytes(directory: str) -> int:
+    return sum([entry.stat().st_size for entry in os.scandir(directory) if entry.is_file() and not entry.name.startswith(".")])
+
+
+def _phase_worker(results: multiprocessing.Queue, func: Callable[..., Dict[str, Any]], args: tuple) -> None:
+    start = time.perf_counter()
+
+    try:
+        stats = func(*args)
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+        return
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["peak_rss_mb"] = _peak_rss_mb()
+
+    results.put(stats)
+
+
+def run_phase(func: Callable[..., Dict[str, Any]], *args) -> Dict[str, Any]:
+    results = multiprocessing.Queue()
+
+    process = multiprocessing.Process(target=_phase_worker, args=(results, func, args))
+    process.start()
+
+    stats = results.get()
+    process.join()
+
+    return stats
+
+
+def phase_parse(search_url: str, searchterms: List[str]) -> Dict[str, Any]:
+    from GoogleImageScraper import GoogleImageScraper
+
+    GoogleImageScraper.search_base_url = search_url
+
+    num_links, num_bytes = 0, 0
+
+    for searchterm in searchterms:
+        with urllib.request.urlopen(GoogleImageScraper.search_url(searchterm)) as response:
+            page_source = response.read().decode()
+
+        num_bytes += len(page_source)
+        num_links += len(GoogleImageScraper.parse_image_links(page_source))
+
+    return {"links": num_links, "bytes": num_bytes}
+
+
+def phase_download(urls: List[str], args: argparse.Namespace, threads_download_num: int) -> Dict[str, Any]:
+    from ImageDownloader import ImageDownloader
+    from ImageIndex import ImageIndex
+    from HostScheduler import HostScheduler
+    from ByteScheduler import ByteScheduler
+
+    save_dir = tempfile.mkdtemp(prefix="benchmark-download-")
+
+    try:
+        index = ImageIndex(save_dir)
+        byte_scheduler = ByteScheduler(args.byte_rate) if args.byte_rate is not None else None
+
+        downloader = ImageDownloader(save_dir, max_connections=threads_download_num, max_connections_per_host=args.threads_download_host, index=index,
+                                     scheduler=HostScheduler(args.host_rate), byte_scheduler=byte_scheduler, max_file_bytes=args.max_file_bytes,
+                                     head_requests=args.head_requests)
+
+        num_saved = downloader.run(urls)
+        index.close()
+
+        return {"images": num_saved, "bytes": _dir_bytes(save_dir)}
+    finally:
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+
+def _point_engines(base_url: str) -> None:
+    from GoogleImageScraper import GoogleImageScraper
+    from BingImageScraper import BingImageScraper
+    from JsonImageScraper import JsonImageScraper
+
+    GoogleImageScraper.search_base_url = base_url + "/search"
+    BingImageScraper.search_base_url = base_url + "/bing/images/search"
+    JsonImageScraper.search_base_url = base_url + "/api/images"
+
+    # Spawned search workers import this module again instead of inheriting the URLs
+    os.environ["BENCHMARK_BASE_URL"] = base_url
+
+
+if __name__ == "__mp_main__" and "BENCHMARK_BASE_URL" in os.environ:
+    _point_engines(os.environ["BENCHMARK_BASE_URL"])
+
+
+def _create_scraper(base_url: str, searchterms: List[str], save_dir: str | None, args: argparse.Namespace, threads_search_num: int, threads_download_num: int):
+    from GoogleImageScraper import GoogleImageScraper
+
+    _point_engines(base_url)
+
+    driver_type = GoogleImageScraper.DriverType[args.driver]
+
+    return GoogleImageScraper(searchterms, save_dir, args.date_num_ranges, args.date_delta_weeks, args.pages, threads_search_num, threads_download_num,
+                              driver_type, True, pipelined=args.pipelined, journal=False, search_cache=False, threads_download_host_num=args.threads_download_host,
+                              download_host_rate=args.host_rate, search_engines=args.engines,
+                              search_backend=GoogleImageScraper.SearchBackend[args.search_backend])
+
+
+def phase_search(base_url: str, searchterms: List[str], args: argparse.Namespace, threads_search_num: int) -> Dict[str, Any]:
+    from ScrapeJournal import ScrapeJournal
+
+    scraper = _create_scraper(base_url, searchterms, None, args, threads_search_num, 1)
+
+    journal = ScrapeJournal()
+    planner = scraper._create_planner()
+
+    img_links = set()
+
+    async def on_links(img_links_elm: List[str]) -> None:
+        img_links.update(img_links_elm)
+
+    asyncio.run(scraper._search(journal, planner, on_links))
+    journal.close()
+
+    return {"links": len(img_links)}
+
+
+def phase_startup(base_url: str, searchterms: List[str], args: argparse.Namespace, threads_search_num: int) -> Dict[str, Any]:
+    # What a short scheduled run pays before its first search result: imports, pool start up and the first task
+    if args.start_method is not None:
+        multiprocessing.set_start_method(args.start_method, force=True)
+
+    start = time.perf_counter()
+
+    from GoogleImageScraper import GoogleImageScraper
+
+    import_seconds = time.perf_counter() - start
+
+    scraper = _create_scraper(base_url, searchterms, None, args, threads_search_num, 1)
+    spec = scraper._create_search_spec()
+    date_set = scraper._create_planner().next_tasks(1)[0]
+
+    search_pool = GoogleImageScraper.SearchPool(scraper._create_search_pool(threads_search_num))
+
+    try:
+        img_links_elm, _ = search_pool.submit(spec.search_task, date_set).result()
+        first_task_seconds = time.perf_counter() - start
+    finally:
+        search_pool.close()
+
+    return {"links": len(img_links_elm), "import_seconds": import_seconds, "first_task_seconds": first_task_seconds,
+            "task_bytes": len(pickle.dumps((spec.search_task, date_set))), "scraper_bytes": len(pickle.dumps(scraper))}
+
+
+def phase_run(base_url: str, searchterms: List[str], args: argparse.Namespace, threads_search_num: int, threads_download_num: int) -> Dict[str, Any]:
+    save_dir = tempfile.mkdtemp(prefix="benchmark-run-")
+
+    try:
+        scraper = _create_scraper(base_url, searchterms, save_dir, args, threads_search_num, threads_download_num)
+        scraper.run()
+
+        num_images = len([file for file in os.listdir(save_dir) if not file.startswith(".")])
+
+        return {"images": num_images, "bytes": _dir_bytes(save_dir)}
+    finally:
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    if "error" in stats:
+        return "failed: " + stats["error"]
+
+    parts = []
+
+    for key in ["links", "images"]:
+        if key in stats:
+            parts.append(f"{stats[key]} {key} ({stats[key] / stats['seconds']:.1f}/s)")
+
+    if "bytes" in stats:
+        parts.append(f"{stats['bytes'] / stats['seconds'] / 1e6:.2f} MB/s")
+
+    if "first_task_seconds" in stats:
+        parts.append(f"first task after {stats['first_task_seconds']:.2f}s (imports {stats['import_seconds']:.2f}s)")
+        parts.append(f"{stats['task_bytes']} bytes per task ({stats['scraper_bytes']} for the scraper)")
+
+    parts.append(f"{stats['seconds']:.2f}s")
+    parts.append(f"peak RSS {stats['peak_rss_mb']:.0f} MB")
+
+    return ", ".join(parts)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark the scraper against a local fake Google Images server")
+
+    arg_parser.add_argument("--phases", nargs="+", default=["parse", "download"], choices=["parse", "download", "search", "startup", "run"])
+    arg_parser.add_argument("--terms", nargs="+", default=["gravel", "sand", "loam", "clay"])
+    arg_parser.add_argument("--threads-search", nargs="+", type=int, default=[4])
+    arg_parser.add_argument("--threads-download", nargs="+", type=int, default=[8])
+    arg_parser.add_argument("--threads-download-host", type=int, default=4)
+    arg_parser.add_argument("--host-rate", type=float, help="downloads per second per host, unlimited by default since every fake image is on one host")
+    arg_parser.add_argument("--images", type=int, default=500, help="number of URLs in the download phase")
+    arg_parser.add_argument("--byte-rate", type=float, help="bytes per second over all downloads in the download phase")
+    arg_parser.add_argument("--max-file-bytes", type=int, help="larger images are skipped in the download phase")
+    arg_parser.add_argument("--head-requests", action="store_true", help="check sizes with HEAD before downloading")
+
+    arg_parser.add_argument("--date-num-ranges", type=int, default=2)
+    arg_parser.add_argument("--date-delta-weeks", type=int, default=24)
+    arg_parser.add_argument("--pages", type=int, default=2)
+    arg_parser.add_argument("--pipelined", action="store_true")
+    arg_parser.add_argument("--driver", default="Firefox", choices=["Firefox", "Chrome"])
+    arg_parser.add_argument("--engines", nargs="+", default=["google"], choices=["google", "bing", "json"], help="json needs no browser")
+    arg_parser.add_argument("--search-backend", default="Auto", choices=["Browser", "Http", "Auto"], help="Http needs no browser either")
+    arg_parser.add_argument("--start-method", choices=multiprocessing.get_all_start_methods(), help="start method of the search workers in the startup phase")
+
+    arg_parser.add_argument("--results-per-page", type=int, default=100)
+    arg_parser.add_argument("--pages-per-query", type=int, default=3)
+    arg_parser.add_argument("--page-latency", type=float, default=0.1)
+    arg_parser.add_argument("--image-latency", type=float, default=0.02)
+    arg_parser.add_argument("--image-size", nargs=2, type=int, default=[200, 1200], metavar=("MIN", "MAX"))
+    arg_parser.add_argument("--error-rate", type=float, default=0.05)
+    arg_parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    arg_parser.add_argument("--seed", type=int, default=0)
+
+    arg_parser.add_argument("--json", help="write the results to this file as well")
+
+    args = arg_parser.parse_args()
+
+    results = []
+
+    with FakeImageServer(results_per_page=args.results_per_page, pages_per_query=args.pages_per_query, page_latency_s=args.page_latency,
+                         image_latency_s=args.image_latency, image_size_range=tuple(args.image_size), error_rate=args.error_rate,
+                         duplicate_rate=args.duplicate_rate, seed=args.seed) as server:
+
+        urls = [f"{server.base_url}/images/{image_id}.jpg" for image_id in range(args.images)]
+
+        for phase in args.phases:
+            if phase == "parse":
+                configs = [{}]
+            elif phase == "download":
+                configs = [{"threads_download_num": num} for num in args.threads_download]
+            elif phase in ["search", "startup"]:
+                configs = [{"threads_search_num": num} for num in args.threads_search]
+            else:
+                configs = [{"threads_search_num": search_num, "threads_download_num": download_num} for search_num in args.threads_search for download_num in args.threads_download]
+
+            for config in configs:
+                if phase == "parse":
+                    stats = run_phase(phase_parse, server.search_url, args.terms)
+                elif phase == "download":
+                    stats = run_phase(phase_download, urls, args, config["threads_download_num"])
+                elif phase == "search":
+                    stats = run_phase(phase_search, server.base_url, args.terms, args, config["threads_search_num"])
+                elif phase == "startup":
+                    stats = run_phase(phase_startup, server.base_url, args.terms, args, config["threads_search_num"])
+                else:
+                    stats = run_phase(phase_run, server.base_url, args.terms, args, config["threads_search_num"], config["threads_download_num"])
+
+                results.append({"phase": phase, **config, **stats})
+
+                print(f"{phase:<10} {' '.join([f'{key}={value}' for key, value in config.items()]):<50} {format_stats(stats)}")
+
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
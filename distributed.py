@@ -0,0 +1,64 @@
+"""
+Spreads one category's searches and downloads over several machines.
+
+    python distributed.py coordinator --manifest example_manifest.yaml --category gravel --bind 0.0.0.0:50000
+    python distributed.py worker --connect coordinator-host:50000 --searches 2 --downloads 16
+
+Both sides read the shared key from --authkey or the SCRAPER_AUTHKEY environment variable. Tasks
+travel pickled, only run this on networks you trust.
+"""
+import argparse, os
+
+from BatchScraper import BatchScraper
+from ScrapeCoordinator import ScrapeCoordinator
+from ScrapeWorker import ScrapeWorker
+
+# Just for typing
+from typing import Tuple
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    (host, _, port) = address.rpartition(":")
+
+    return (host or "0.0.0.0", int(port) if port else ScrapeCoordinator.default_port)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Run a category's searches and downloads on several machines")
+    arg_parser.add_argument("--authkey", default=os.environ.get("SCRAPER_AUTHKEY"), help="shared key, defaults to $SCRAPER_AUTHKEY")
+
+    sub_parsers = arg_parser.add_subparsers(dest="role", required=True)
+
+    coordinator_parser = sub_parsers.add_parser("coordinator", help="plan the searches, number and save the images")
+    coordinator_parser.add_argument("--manifest", required=True, help="YAML or JSON manifest, see example_manifest.yaml")
+    coordinator_parser.add_argument("--category", help="category of the manifest to run, needed when it has more than one")
+    coordinator_parser.add_argument("--bind", default=f"0.0.0.0:{ScrapeCoordinator.default_port}", help="host:port to listen on")
+
+    worker_parser = sub_parsers.add_parser("worker", help="run searches and downloads for a coordinator")
+    worker_parser.add_argument("--connect", required=True, help="host:port of the coordinator")
+    worker_parser.add_argument("--searches", type=int, help="searches at once, defaults to the manifest's threads_search_num")
+    worker_parser.add_argument("--downloads", type=int, help="downloads at once, defaults to the manifest's threads_download_num")
+    worker_parser.add_argument("--metrics", help="JSON lines file for this worker's search and download metrics")
+
+    args = arg_parser.parse_args()
+
+    if not args.authkey:
+        arg_parser.error("an authkey is needed, pass --authkey or set SCRAPER_AUTHKEY")
+
+    authkey = args.authkey.encode()
+
+    if args.role == "coordinator":
+        batch = BatchScraper.from_manifest(args.manifest)
+        categories = {category.name: category for category in batch.categories}
+
+        if args.category is None and len(categories) > 1:
+            arg_parser.error("the manifest has several categories, pick one with --category: " + ", ".join(categories))
+
+        category = batch.categories[0] if args.category is None else categories.get(args.category)
+
+        if category is None:
+            arg_parser.error(f"no category {args.category} in the manifest")
+
+        ScrapeCoordinator(category.scraper, parse_address(args.bind), authkey).run()
+    else:
+        ScrapeWorker(parse_address(args.connect), authkey, args.searches, args.downloads, metrics_path=args.metrics).run()
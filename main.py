@@ -9,12 +9,15 @@ Created on Sun Jul 12 11:02:06 2020
 import os
 import concurrent.futures
 from GoogleImageScraper import GoogleImageScraper
+from BatchScraper import BatchScraper
 from datetime import timedelta
 import argparse
 
 if __name__ == "__main__":
-    # arg_parser = argparse.ArgumentParser(description="Download Images from Google Images using selenium")
-    # arg_parser.add_argument('')
+    arg_parser = argparse.ArgumentParser(description="Download Images from Google Images using selenium")
+    arg_parser.add_argument("--manifest", help="YAML or JSON manifest of categories to run instead of the ones below, see example_manifest.yaml")
+
+    args = arg_parser.parse_args()
 
     headless = True                     # True = No Chrome GUI
 
@@ -36,12 +39,23 @@ if __name__ == "__main__":
     driver_type = GoogleImageScraper.DriverType.Firefox 
     driver_headless: bool = True
 
+    metrics_path = "./scrape_metrics.jsonl"     # One JSON line per search and download, None to turn off
+    metrics_port = None                         # e.g. 9109 to serve Prometheus metrics during the run
+
+    download_byte_rate = None                   # e.g. 20e6 to hold all downloads to 20 MB/s
+    min_free_bytes = None                       # e.g. 10e9 to pause downloads while a save location has less than 10 GB free
+
+    if args.manifest is not None:
+        batch = BatchScraper.from_manifest(args.manifest)
+    else:
+        # Every category runs through the same search and download workers
+        categories = [(os.path.basename(os.path.normpath(save_loc)), GoogleImageScraper(terms, save_loc, date_num_ranges, date_delta, pages_num,
+                                                                                        threads_search_num, threads_download_num,
+                                                                                        driver_type=driver_type, driver_headless=driver_headless))
+                      for (terms, save_loc) in search_terms]
 
-    gimage = GoogleImageScraper(search_terms[0][0], search_terms[0][1], date_num_ranges, date_delta, pages_num, threads_search_num, \
-                                threads_download_num, driver_type, driver_headless)
+        batch = BatchScraper(categories, threads_search_num, threads_download_num, metrics_path=metrics_path, metrics_port=metrics_port,
+                             download_byte_rate=download_byte_rate, min_free_bytes=min_free_bytes)
 
-    for (terms, save_loc) in search_terms:
-        gimage.search_terms = terms
-        gimage.save_location = save_loc
-        gimage.run()
+    batch.run()
 
@@ -0,0 +1,4 @@
+import pathlib, sys
+
+# The modules live at the top of the repo, not in a package
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
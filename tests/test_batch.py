@@ -0,0 +1,20 @@
+from BatchScraper import BatchScraper
+
+
+def test_category_settings_override_the_batch(tmp_path):
+    manifest = {"engine": "json", "threads_search_num": 6, "threads_download_num": 12, "threads_download_host_num": 4, "download_host_rate": 8,
+                "defaults": {"journal": False, "search_cache": False},
+                "categories": [{"name": "sand", "save_location": str(tmp_path / "sand"), "search_terms": ["sand"]},
+                               {"name": "clay", "save_location": str(tmp_path / "clay"), "search_terms": ["clay"],
+                                "download_host_rate": 2, "threads_download_host_num": 1}]}
+
+    batch = BatchScraper.from_manifest(manifest)
+
+    (sand, clay) = [category.scraper for category in batch.categories]
+
+    # Left to the batch
+    assert (sand.threads_search_num, sand.threads_download_num, sand.threads_download_host_num, sand.download_host_rate) == (6, 12, 4, 8)
+    assert (clay.threads_search_num, clay.threads_download_num) == (6, 12)
+
+    assert (clay.threads_download_host_num, clay.download_host_rate) == (1, 2)
+    assert (batch.threads_download_host_num, batch.download_host_rate) == (4, 8)
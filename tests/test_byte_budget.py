@@ -0,0 +1,69 @@
+import asyncio, os
+
+from aiohttp import web
+
+from ByteScheduler import ByteScheduler
+from FakeImageServer import FakeImageServer
+from ImageDownloader import ImageDownloader
+
+
+images = FakeImageServer(image_size_range=(100, 200))
+
+
+async def handle_image(request):
+    # Chunked, so the downloader never sees a Content-Length
+    response = web.StreamResponse(headers={"Content-Type": "image/jpeg"})
+    await response.prepare(request)
+
+    body = images.image(int(request.match_info["image_id"]))
+
+    for start in range(0, len(body), 4096):
+        await response.write(body[start:start + 4096])
+        await asyncio.sleep(0.001)
+
+    await response.write_eof()
+    return response
+
+
+async def download_all(save_dir, byte_scheduler, num_images):
+    app = web.Application()
+    app.router.add_get("/images/{image_id}.jpg", handle_image)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+
+    port = site._server.sockets[0].getsockname()[1]
+
+    try:
+        downloader = ImageDownloader(save_dir, max_connections=8, max_connections_per_host=8, chunk_size=4096, byte_scheduler=byte_scheduler)
+        results = []
+
+        await downloader.download_all([f"http://127.0.0.1:{port}/images/{i}.jpg" for i in range(num_images)], lambda url, result: results.append(result))
+
+        return results
+    finally:
+        await runner.cleanup()
+
+
+def saved_bytes(save_dir):
+    return sum(entry.stat().st_size for entry in os.scandir(save_dir) if entry.is_file() and not entry.name.startswith("."))
+
+
+def test_budget_holds_for_concurrent_downloads_without_content_length(tmp_path):
+    budget = len(images.image(0)) * 3
+    byte_scheduler = ByteScheduler(max_bytes=budget)
+
+    results = asyncio.run(download_all(tmp_path, byte_scheduler, 32))
+
+    assert byte_scheduler.num_bytes <= budget
+    assert saved_bytes(tmp_path) <= budget
+    assert byte_scheduler.reserved_bytes == 0
+
+    assert ImageDownloader.Result.Saved in results
+    assert ImageDownloader.Result.OverBudget in results
+
+    # Streams cut off by the budget don't leave their temp files behind
+    assert os.listdir(tmp_path / ImageDownloader.partial_dir_name) == []
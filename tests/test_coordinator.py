@@ -0,0 +1,27 @@
+import datetime
+
+from ImageDownloader import ImageDownloader
+from JsonImageScraper import JsonImageScraper
+from ScrapeCoordinator import ScrapeCoordinator
+
+
+def test_budget_holds_over_all_workers(tmp_path):
+    scraper = JsonImageScraper(["sand"], tmp_path, search_cache=False, download_byte_budget=1000)
+    coordinator = ScrapeCoordinator(scraper, authkey=b"key")
+    coordinator._open()
+
+    try:
+        urls = [f"http://host/{num}.jpg" for num in range(10)]
+        coordinator.journal.add_search_results("sand", datetime.date(2026, 1, 1), datetime.date(2025, 12, 1), urls)
+
+        # As if handed to two different workers
+        assert coordinator._next_downloads(2) == urls[:2]
+        assert coordinator._next_downloads(2) == urls[2:4]
+
+        assert coordinator._store_image(b"x" * 600, ".jpg", "a", None, urls[0]) == ImageDownloader.Result.Saved
+        assert coordinator._store_image(b"y" * 600, ".jpg", "b", None, urls[2]) == ImageDownloader.Result.OverBudget
+
+        # The rest waits for the next run
+        assert coordinator._next_downloads(2) == []
+    finally:
+        coordinator._close()
@@ -0,0 +1,24 @@
+import pathlib
+
+from GoogleImageScraper import GoogleImageScraper
+
+
+fixtures = pathlib.Path(__file__).parent / "fixtures"
+
+
+def test_parse_image_links_from_result_page():
+    page_source = (fixtures / "google_result_page.html").read_text(encoding="utf-8")
+
+    assert GoogleImageScraper.parse_image_links(page_source) == [
+        # imgurl in an href, HTML escaped and percent encoded
+        "https://images.example.com/gravel/pile.jpg",
+        # Decoded once, the %20 in the original URL stays
+        "https://cdn.example.org/a%20b.png",
+        # Inline data, \u escaped, without the thumbnails on Google's own hosts and the link already found above
+        "https://photos.example.net/sand=1.jpg?size=large&v=2",
+        "https://example.com/été/gravier.jpg",
+    ]
+
+
+def test_parse_image_links_from_empty_page():
+    assert GoogleImageScraper.parse_image_links("<html><body>Looks like you've reached the end</body></html>") == []
@@ -0,0 +1,95 @@
+import asyncio, time
+
+from HostScheduler import HostScheduler
+from ImageDownloader import ImageDownloader
+
+
+class ScriptedDownloader(ImageDownloader):
+    # Plays back a list of outcomes instead of going to the network
+
+    def __init__(self, outcomes, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.outcomes = list(outcomes)
+
+    async def _download(self, session, url, timings):
+        outcome = self.outcomes.pop(0)
+
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        return outcome
+
+
+def create_downloader(tmp_path, scheduler, outcomes):
+    return ScriptedDownloader(outcomes, tmp_path, scheduler=scheduler, max_retries=1, backoff_base_s=0)
+
+
+def trip(tmp_path, scheduler):
+    downloader = create_downloader(tmp_path, scheduler, [ImageDownloader.TransientError("connection refused", host_level=True)])
+
+    assert asyncio.run(downloader.download(None, "http://host/a.jpg")) == ImageDownloader.Result.Parked
+    assert scheduler.is_parked("host")
+
+
+def test_probe_retry_recovers_host(tmp_path):
+    scheduler = HostScheduler(failure_threshold=1, open_duration_s=0.05)
+    trip(tmp_path, scheduler)
+
+    time.sleep(0.06)
+
+    # The probe gets a 503 for its own URL, its retry goes through as the next probe
+    downloader = create_downloader(tmp_path, scheduler, [ImageDownloader.TransientError("HTTP 503"), ImageDownloader.Result.Failed])
+
+    assert asyncio.run(downloader.download(None, "http://host/b.jpg")) == ImageDownloader.Result.Failed
+    assert not scheduler.is_parked("host")
+    assert not scheduler.is_probing("host")
+
+
+def test_failed_probe_parks_until_next_probe(tmp_path):
+    scheduler = HostScheduler(failure_threshold=1, open_duration_s=0.05)
+    trip(tmp_path, scheduler)
+
+    time.sleep(0.06)
+
+    downloader = create_downloader(tmp_path, scheduler, [ImageDownloader.TransientError("connection refused", host_level=True)])
+
+    assert asyncio.run(downloader.download(None, "http://host/b.jpg")) == ImageDownloader.Result.Parked
+    assert scheduler.is_parked("host")
+
+    # Parked for twice as long after a failed probe
+    time.sleep(0.11)
+
+    downloader = create_downloader(tmp_path, scheduler, [ImageDownloader.Result.Failed])
+
+    assert asyncio.run(downloader.download(None, "http://host/c.jpg")) == ImageDownloader.Result.Failed
+    assert not scheduler.is_parked("host")
+
+
+def run_all(tmp_path, scheduler, outcomes, urls):
+    downloader = ScriptedDownloader(outcomes, tmp_path, scheduler=scheduler, max_retries=1, backoff_base_s=0.01, max_connections=2)
+    results = {}
+
+    asyncio.run(downloader.download_all(urls, on_result=lambda url, result: results.__setitem__(url, result)))
+
+    return results
+
+
+def test_parked_urls_are_downloaded_once_the_park_runs_out(tmp_path):
+    scheduler = HostScheduler(failure_threshold=1, open_duration_s=0.05)
+    urls = [f"http://host/{num}.jpg" for num in range(4)]
+
+    # The first URL parks the host, the probe after the park succeeds and the rest follow it
+    results = run_all(tmp_path, scheduler, [ImageDownloader.TransientError("connection refused", host_level=True)] + [ImageDownloader.Result.Saved] * 4, urls)
+
+    assert results == {url: ImageDownloader.Result.Saved for url in urls}
+
+
+def test_parked_urls_give_up_on_a_dead_host(tmp_path):
+    scheduler = HostScheduler(failure_threshold=1, open_duration_s=0.02)
+    urls = [f"http://host/{num}.jpg" for num in range(4)]
+
+    start = time.monotonic()
+    results = run_all(tmp_path, scheduler, [ImageDownloader.TransientError("connection refused", host_level=True)] * 50, urls)
+
+    assert results == {url: ImageDownloader.Result.Parked for url in urls}
+    assert time.monotonic() - start < 5
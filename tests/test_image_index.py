@@ -0,0 +1,30 @@
+from PIL import Image
+
+from ImageIndex import ImageIndex
+
+
+def _save_existing(path):
+    Image.new("RGB", (8, 8), (255, 0, 0)).save(path / "0.png")
+    return ImageIndex.content_hash(path / "0.png")
+
+
+def test_existing_images_are_not_hashed_by_default(tmp_path):
+    content_hash = _save_existing(tmp_path)
+
+    index = ImageIndex(tmp_path)
+    assert not index.contains_content(content_hash)
+    index.close()
+
+
+def test_backfill_runs_once_even_on_an_existing_index(tmp_path):
+    content_hash = _save_existing(tmp_path)
+    ImageIndex(tmp_path).close()
+
+    index = ImageIndex(tmp_path, backfill=True)
+    assert index.contains_content(content_hash)
+    index.connection.execute("DELETE FROM images")
+    index.close()
+
+    index = ImageIndex(tmp_path, backfill=True)
+    assert not index.contains_content(content_hash)
+    index.close()
@@ -0,0 +1,23 @@
+import pytest
+
+from PIL import Image
+
+from ImageValidator import ImageValidator
+
+
+@pytest.mark.parametrize("save_format", ["JPEG", "jpeg", "JPG", "jpg"])
+def test_jpeg_aliases_convert_alpha(tmp_path, save_format):
+    path = tmp_path / "0.png"
+    Image.new("RGBA", (8, 8), (255, 0, 0, 128)).save(path)
+
+    validator = ImageValidator(save_format=save_format)
+    assert validator.save_format == "JPEG"
+    assert validator.transform(path, "PNG") == (True, "JPEG")
+
+    with Image.open(path) as image:
+        assert image.format == "JPEG" and image.mode == "RGB"
+
+
+def test_unknown_format_is_rejected_early():
+    with pytest.raises(ValueError):
+        ImageValidator(save_format="notaformat")
@@ -0,0 +1,33 @@
+import datetime
+
+from ImageDownloader import ImageDownloader
+from ScrapeJournal import ScrapeJournal
+
+
+def test_saved_survives_a_kill(tmp_path):
+    journal = ScrapeJournal(tmp_path)
+
+    urls = [f"http://host/{num}.jpg" for num in range(10)]
+    journal.add_search_results("sand", datetime.date(2026, 1, 1), datetime.date(2025, 12, 1), urls)
+
+    downloader = ImageDownloader(tmp_path, journal=journal)
+    downloader.clean_partial()
+
+    for url in urls[:3]:
+        temp_path = downloader._next_temp_path()
+
+        with open(temp_path, 'wb') as file:
+            file.write(url.encode())
+
+        assert downloader.commit(temp_path, ".jpg", url, url=url) == ImageDownloader.Result.Saved
+
+    # Batched statuses are allowed to go with the process
+    journal.set_link_status(urls[3], ScrapeJournal.LinkStatus.Failed)
+
+    # A second connection sees what a resumed run would after a kill, before anything closes the journal
+    resumed = ScrapeJournal(tmp_path)
+
+    assert list(resumed.pending_links()) == urls[3:]
+
+    resumed.close()
+    journal.close()
@@ -0,0 +1,32 @@
+from FakeImageServer import FakeImageServer
+from ImageScraper import ImageScraper
+from JsonImageScraper import JsonImageScraper
+
+
+class LocalJsonImageScraper(JsonImageScraper):
+    engine_name = "local_json"
+    extra_params = {}
+
+
+def test_subclass_queries_its_own_endpoint():
+    with FakeImageServer(page_latency_s=0, pages_per_query=2) as server:
+        LocalJsonImageScraper.search_base_url = server.api_url
+
+        img_links = ImageScraper.get_engine("local_json").fetch_image_links("sand", pages_num=5)
+
+        assert img_links == list(dict.fromkeys(server.result_links("sand", 0, "json") + server.result_links("sand", 1, "json")))
+
+    # The parent engine is left pointing where it was
+    assert JsonImageScraper.search_base_url != LocalJsonImageScraper.search_base_url
+    assert JsonImageScraper.page_url("sand", 1).startswith(JsonImageScraper.search_base_url)
+
+
+def test_parse_image_links_uses_subclass_keys():
+    class NestedJsonImageScraper(JsonImageScraper):
+        engine_name = "nested_json"
+        results_key = "items"
+        url_key = "link"
+
+    payload = {"items": [{"link": "https://example.com/a.jpg"}, {"link": "not a url"}, {"url": "https://example.com/b.jpg"}]}
+
+    assert NestedJsonImageScraper.parse_image_links(payload) == ["https://example.com/a.jpg"]
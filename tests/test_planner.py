@@ -0,0 +1,103 @@
+import datetime
+
+from JsonImageScraper import JsonImageScraper
+from QueryPlanner import QueryPlanner
+
+
+class DatedJsonImageScraper(JsonImageScraper):
+    engine_name = "dated_json"
+    supports_date_ranges = True
+
+
+def windows(tmp_path, date_start, search_cache=True):
+    scraper = DatedJsonImageScraper(["sand"], tmp_path, date_num_ranges=6, date_delta=4, journal=False, search_cache=search_cache)
+
+    return [(before, after) for (before, after, _, _) in scraper._create_planner(date_start).next_tasks(6)]
+
+
+def test_windows_repeat_across_runs(tmp_path):
+    # The day after a grid line
+    date_start = datetime.date(2026, 11, 3)
+
+    # Every run within the same window plans the same windows
+    for num_days in [1, 7, 20]:
+        assert windows(tmp_path, date_start + datetime.timedelta(days=num_days)) == windows(tmp_path, date_start)
+
+    # A run a window later searches one new window, the older ones are the same as before
+    later = windows(tmp_path, date_start + datetime.timedelta(weeks=4))
+
+    assert later[1:] == windows(tmp_path, date_start)[:-1]
+
+
+def test_windows_cover_date_start(tmp_path):
+    date_start = datetime.date(2026, 10, 18)
+
+    (before, after) = windows(tmp_path, date_start)[0]
+
+    assert after < date_start <= before
+    assert before - after == datetime.timedelta(weeks=4)
+    assert windows(tmp_path, date_start, search_cache=False)[0][0] == date_start
+
+
+START = datetime.date(2026, 1, 1)
+WEEK = datetime.timedelta(weeks=1)
+
+
+def planner(max_tasks=10, delta=4*WEEK, **kwargs):
+    return QueryPlanner(["sand"], START, max_tasks, delta, adaptive=True, saturation_links=100, **kwargs)
+
+
+def test_saturated_window_is_split_before_new_ground():
+    plan = planner()
+    [task] = plan.next_tasks(1)
+
+    plan.report(task, 100, 100)
+
+    middle = START - 2*WEEK
+
+    # Both halves first, then new windows at half the width
+    assert plan.next_tasks(3) == [(START, middle, "sand", ""), (middle, START - 4*WEEK, "sand", ""), (START - 4*WEEK, START - 6*WEEK, "sand", "")]
+
+
+def test_saturated_window_at_min_window_is_not_split():
+    plan = planner(delta=WEEK)
+    [task] = plan.next_tasks(1)
+
+    plan.report(task, 100, 100)
+
+    assert plan.next_tasks(1) == [(START - WEEK, START - 2*WEEK, "sand", "")]
+
+
+def test_sparse_windows_widen_up_to_max_window():
+    plan = planner(max_window=10*WEEK)
+    [task] = plan.next_tasks(1)
+
+    plan.report(task, 5, 5)
+    [task] = plan.next_tasks(1)
+
+    assert task[0] - task[1] == 8*WEEK
+
+    plan.report(task, 5, 5)
+    [task] = plan.next_tasks(1)
+
+    assert task[0] - task[1] == 10*WEEK
+
+
+def test_stops_once_windows_return_nothing_new():
+    plan = planner(yield_window=2)
+
+    for _ in range(2):
+        [task] = plan.next_tasks(1)
+        plan.report(task, 50, 1)
+
+    assert plan.next_tasks(1) == []
+
+
+def test_splits_count_against_max_tasks():
+    plan = planner(max_tasks=3)
+    [task] = plan.next_tasks(1)
+
+    plan.report(task, 100, 100)
+
+    assert len(plan.next_tasks(10)) == 2
+    assert plan.next_tasks(10) == []
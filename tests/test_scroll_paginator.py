@@ -0,0 +1,51 @@
+import time
+
+from ScrollPaginator import ScrollPaginator
+
+
+class FakeDriver:
+    # Every click loads results_per_click more results, load_s after it was made. The button is hidden while a page loads
+
+    def __init__(self, results_per_click: int, load_s: float = 0, max_clicks: int | None = None) -> None:
+        self.results_per_click = results_per_click
+        self.load_s = load_s
+        self.max_clicks = max_clicks
+        self.clicks = []
+
+    def execute_script(self, script, *args):
+        now = time.monotonic()
+        results = 20 + self.results_per_click * len([click for click in self.clicks if now - click >= self.load_s])
+
+        loading = len(self.clicks) > 0 and now - self.clicks[-1] < self.load_s
+        clicked = not loading and (self.max_clicks is None or len(self.clicks) < self.max_clicks)
+
+        if clicked:
+            self.clicks.append(now)
+
+        return {"results": results, "height": results * 10, "end": False, "clicked": clicked}
+
+
+def create_paginator() -> ScrollPaginator:
+    return ScrollPaginator("div", None, "", "//input", min_interval_s=0.01, max_interval_s=0.05, idle_timeout_s=0.3)
+
+
+def test_button_that_loads_nothing_is_no_progress():
+    paginator = create_paginator()
+
+    assert paginator.run(FakeDriver(0), pages_num=5) == 0
+
+    start = time.monotonic()
+
+    assert paginator.run(FakeDriver(0), pages_num=-1) == 0
+    assert time.monotonic() - start < 1
+
+
+def test_pages_count_once_they_load():
+    paginator = create_paginator()
+
+    # Slower than the poll interval, a click alone must not count
+    assert paginator.run(FakeDriver(20, load_s=0.05), pages_num=3) == 3
+
+    driver = FakeDriver(20, load_s=0.05, max_clicks=4)
+
+    assert paginator.run(driver, pages_num=-1) == 4